@@ -0,0 +1,322 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""Load test for the connect path handlers against local AWS stand-ins.
+
+Every simulated connect creates a session, resolves it the way the gateway
+does (QUIC attempt followed by HTTP fallback) and authenticates it from the
+DCV server. EC2, DynamoDB and KMS are served by moto in-process, with an
+optional artificial round trip added to every AWS call.
+
+    python benchmarks/load_test.py --connects 1000 --concurrency 8 --latency-ms 5
+"""
+
+import argparse
+import importlib.util
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote_plus, urlencode
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# the shared runtime layer is mounted on sys.path by Lambda, mirror it here
+sys.path.insert(0, os.path.join(ROOT, "src", "common", "python"))
+TABLE_NAME = "DcvAccessManagement"
+# moto does not check that images exist, so its default AMIs are not loaded
+IMAGE_ID = "ami-0123456789abcdef0"
+
+
+class AwsCallRecorder:
+    """Counts AWS API calls and adds a fixed delay to each of them."""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    def __call__(self, event_name, **kwargs):
+        _, service, operation = event_name.split(".")
+        with self._lock:
+            self.calls[f"{service}.{operation}"] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+
+def load_handler(name):
+    spec = importlib.util.spec_from_file_location(
+        f"{name}_index", os.path.join(ROOT, "src", name, "index.py")
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.handler
+
+
+def create_environment(instance_count):
+    import boto3
+
+    dynamodb = boto3.client("dynamodb")
+    dynamodb.create_table(
+        TableName=TABLE_NAME,
+        KeySchema=[{"AttributeName": "session_id", "KeyType": "HASH"}],
+        AttributeDefinitions=[
+            {"AttributeName": "session_id", "AttributeType": "S"},
+            {"AttributeName": "active_instance_id", "AttributeType": "S"},
+            {"AttributeName": "active_username", "AttributeType": "S"},
+            {"AttributeName": "activated_at", "AttributeType": "N"},
+        ],
+        GlobalSecondaryIndexes=[
+            {
+                "IndexName": index_name,
+                "KeySchema": [
+                    {"AttributeName": partition_key, "KeyType": "HASH"},
+                    {"AttributeName": "activated_at", "KeyType": "RANGE"},
+                ],
+                "Projection": {
+                    "ProjectionType": "INCLUDE",
+                    "NonKeyAttributes": [
+                        "instance_id",
+                        "username",
+                        "created_at",
+                        "expire_at",
+                        "ttl",
+                        "instance_ip",
+                        "client_ip",
+                    ],
+                },
+            }
+            for index_name, partition_key in [
+                ("ActiveByInstance", "active_instance_id"),
+                ("ActiveByUser", "active_username"),
+            ]
+        ],
+        BillingMode="PAY_PER_REQUEST",
+    )
+    key_id = boto3.client("kms").create_key()["KeyMetadata"]["KeyId"]
+
+    ec2 = boto3.client("ec2")
+    instances = ec2.run_instances(
+        ImageId=IMAGE_ID,
+        MinCount=instance_count,
+        MaxCount=instance_count,
+        TagSpecifications=[
+            {
+                "ResourceType": "instance",
+                "Tags": [
+                    {"Key": "dcv:type", "Value": "server"},
+                    {"Key": "dcv:user", "Value": "dcv"},
+                ],
+            }
+        ],
+    )["Instances"]
+    return key_id, [
+        (instance["InstanceId"], instance["PrivateIpAddress"]) for instance in instances
+    ]
+
+
+def timed(latencies, name, handler, event):
+    start = time.perf_counter()
+    response = handler(event, None)
+    latencies[name].append((time.perf_counter() - start) * 1000)
+    return response
+
+
+def alb_event(event):
+    """The event an internal ALB sends for the same request."""
+    return {
+        "requestContext": {"elb": {"targetGroupArn": "arn:aws:elasticloadbalancing"}},
+        "httpMethod": event["httpMethod"],
+        "path": event["resource"],
+        "queryStringParameters": {
+            name: quote_plus(value)
+            for name, value in (event.get("queryStringParameters") or {}).items()
+        },
+        "headers": {"x-forwarded-for": event["requestContext"]["identity"]["sourceIp"]},
+        "body": event["body"],
+        "isBase64Encoded": False,
+    }
+
+
+def connect(handlers, latencies, errors, instance, reconnects, frontend):
+    # the connect path events, create_session is always called through REST
+    connect_path_event = alb_event if frontend == "alb" else lambda event: event
+    instance_id, instance_ip = instance
+    response = timed(
+        latencies,
+        "create_session",
+        handlers["create_session"],
+        {
+            "resource": "/session",
+            "httpMethod": "POST",
+            "queryStringParameters": {"instanceId": instance_id},
+            "requestContext": {"identity": {"sourceIp": "10.0.0.1"}},
+            "body": None,
+        },
+    )
+    if response["statusCode"] != 200:
+        errors["create_session"] += 1
+        return
+    session = json.loads(response["body"])
+
+    for transport in ["QUIC", "HTTP"] + ["HTTP"] * reconnects:
+        response = timed(
+            latencies,
+            "resolver",
+            handlers["resolver"],
+            connect_path_event(
+                {
+                    "resource": "/resolveSession",
+                    "httpMethod": "POST",
+                    "queryStringParameters": {
+                        "sessionId": session["sessionId"],
+                        "transport": transport,
+                    },
+                    "requestContext": {"identity": {"sourceIp": "10.0.0.2"}},
+                    "body": urlencode(
+                        {
+                            "sessionId": session["sessionId"],
+                            "transport": transport,
+                            "clientIpAddress": "198.51.100.7",
+                        }
+                    ),
+                }
+            ),
+        )
+        if response["statusCode"] != 200:
+            errors["resolver"] += 1
+
+    response = timed(
+        latencies,
+        "authenticator",
+        handlers["authenticator"],
+        connect_path_event(
+            {
+                "resource": "/authenticate",
+                "httpMethod": "POST",
+                "requestContext": {"identity": {"sourceIp": instance_ip}},
+                "body": urlencode(
+                    {
+                        "sessionId": session["sessionId"],
+                        "authenticationToken": session["authToken"],
+                    }
+                ),
+            }
+        ),
+    )
+    if response["statusCode"] != 200:
+        errors["authenticator"] += 1
+
+
+def percentile(values, p):
+    return statistics.quantiles(values, n=100, method="inclusive")[p - 1]
+
+
+def report(latencies, errors, calls, connects, elapsed):
+    print(f"{connects} connects in {elapsed:.2f}s ({connects / elapsed:.1f}/s)\n")
+    print(
+        f"{'handler':<16}{'calls':>8}{'errors':>8}{'p50 ms':>10}"
+        f"{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}"
+    )
+    for name, values in latencies.items():
+        print(
+            f"{name:<16}{len(values):>8}{errors[name]:>8}"
+            f"{percentile(values, 50):>10.2f}{percentile(values, 95):>10.2f}"
+            f"{percentile(values, 99):>10.2f}{len(values) / elapsed:>10.1f}"
+        )
+    print(f"\n{'AWS API call':<32}{'count':>8}{'per connect':>14}")
+    for name, count in sorted(calls.items()):
+        print(f"{name:<32}{count:>8}{count / connects:>14.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--connects", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=1)
+    parser.add_argument("--instances", type=int, default=10)
+    parser.add_argument(
+        "--latency-ms",
+        type=float,
+        default=0,
+        help="artificial round trip added to every AWS API call",
+    )
+    parser.add_argument("--token-mode", choices=["kms", "local"], default="kms")
+    parser.add_argument(
+        "--reconnects",
+        type=int,
+        default=0,
+        help="additional HTTP resolves of each session by the gateway",
+    )
+    parser.add_argument(
+        "--frontend",
+        choices=["rest", "alb"],
+        default="rest",
+        help="event format of the connect path front end",
+    )
+    parser.add_argument(
+        "--session-cache-ttl",
+        type=int,
+        default=0,
+        help="seconds the resolver keeps session items it read, 0 disables",
+    )
+    args = parser.parse_args()
+
+    os.environ.update(
+        {
+            "AWS_DEFAULT_REGION": "us-east-1",
+            "AWS_ACCESS_KEY_ID": "testing",
+            "AWS_SECRET_ACCESS_KEY": "testing",
+            "DCV_TABLE_NAME": TABLE_NAME,
+            "DCV_TOKEN_MODE": args.token_mode,
+            # the report below replaces the per-invocation EMF documents
+            "DCV_METRICS": "false",
+            "DCV_SESSION_CACHE_TTL": str(args.session_cache_ttl),
+            "MOTO_EC2_LOAD_DEFAULT_AMIS": "false",
+        }
+    )
+
+    import boto3
+    from moto import mock_aws
+
+    with mock_aws():
+        key_id, instances = create_environment(args.instances)
+        os.environ["DCV_KMS_KEY"] = key_id
+
+        # the shared clients are created from the default session, so the
+        # recorder has to be registered on it before any handler runs
+        recorder = AwsCallRecorder(args.latency_ms / 1000)
+        boto3.setup_default_session()
+        boto3.DEFAULT_SESSION.events.register("before-call.*.*", recorder)
+        handlers = {
+            name: load_handler(name)
+            for name in ["create_session", "resolver", "authenticator"]
+        }
+
+        latencies = defaultdict(list)
+        errors = Counter()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            list(
+                executor.map(
+                    lambda i: connect(
+                        handlers,
+                        latencies,
+                        errors,
+                        instances[i % len(instances)],
+                        args.reconnects,
+                        args.frontend,
+                    ),
+                    range(args.connects),
+                )
+            )
+        elapsed = time.perf_counter() - start
+
+    report(latencies, errors, recorder.calls, args.connects, elapsed)
+    return 1 if sum(errors.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
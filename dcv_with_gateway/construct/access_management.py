@@ -1,6 +1,7 @@
 # Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 # SPDX-License-Identifier: MIT-0
 
+import json
 from typing import List
 
 from aws_cdk import (
@@ -9,16 +10,51 @@ from aws_cdk import (
     aws_ec2 as ec2,
     aws_lambda as lambda_,
     aws_apigateway as apigateway,
+    aws_apigatewayv2 as apigatewayv2,
+    aws_apigatewayv2_integrations as apigatewayv2_integrations,
+    aws_certificatemanager as acm,
     aws_iam as iam,
     aws_kms as kms,
-    BundlingOptions,
+    Duration,
     aws_dynamodb as dynamodb,
     RemovalPolicy,
     aws_logs as logs,
+    aws_applicationautoscaling as appscaling,
+    aws_dax as dax,
+    aws_elasticloadbalancingv2 as elbv2,
+    aws_elasticloadbalancingv2_targets as elbv2_targets,
+    aws_route53 as route53,
+    aws_route53_targets as route53_targets,
+    aws_xray as xray,
+    Names,
+    BundlingOptions,
+    TimeZone,
 )
 from constructs import Construct
 from cdk_nag import NagSuppressions
 
+from dcv_with_gateway.construct.session_table import grant_resolve
+
+API_LOGGING_PROFILES = ("off", "errors", "traced", "full")
+API_FRONTENDS = ("rest", "alb", "http")
+
+# one compact JSON line per request, without headers, bodies or tokens
+API_ACCESS_LOG_FORMAT = apigateway.AccessLogFormat.custom(
+    json.dumps(
+        {
+            "requestId": apigateway.AccessLogField.context_request_id(),
+            "time": apigateway.AccessLogField.context_request_time_epoch(),
+            "ip": apigateway.AccessLogField.context_identity_source_ip(),
+            "method": apigateway.AccessLogField.context_http_method(),
+            "resource": apigateway.AccessLogField.context_resource_path(),
+            "status": apigateway.AccessLogField.context_status(),
+            "latency": apigateway.AccessLogField.context_response_latency(),
+            "integrationLatency": apigateway.AccessLogField.context_integration_latency(),
+            "error": apigateway.AccessLogField.context_error_message(),
+        }
+    )
+)
+
 
 class AccessManagement(Resource):
 
@@ -45,11 +81,83 @@ class AccessManagement(Resource):
                 name="session_id", type=dynamodb.AttributeType.STRING
             ),
             billing_mode=dynamodb.BillingMode.PAY_PER_REQUEST,
+            # expire_at only bounds when a session can be activated, the
+            # authenticator extends ttl while the session is in use
+            time_to_live_attribute="ttl",
             removal_policy=RemovalPolicy.DESTROY,
         )
-        api_logs = logs.LogGroup(
-            self, "DcvAccessManagementApiLogs", removal_policy=RemovalPolicy.DESTROY
+        self.database = database
+        # Sparse indexes over activated sessions: the authenticator copies
+        # instance_id and username into the active_* keys on activation, so
+        # historical sessions that were never activated stay out of them.
+        # The secret is never projected.
+        active_session_attributes = [
+            "instance_id",
+            "username",
+            "created_at",
+            "expire_at",
+            "ttl",
+            "instance_ip",
+            "client_ip",
+        ]
+        database.add_global_secondary_index(
+            index_name="ActiveByInstance",
+            partition_key=dynamodb.Attribute(
+                name="active_instance_id", type=dynamodb.AttributeType.STRING
+            ),
+            sort_key=dynamodb.Attribute(
+                name="activated_at", type=dynamodb.AttributeType.NUMBER
+            ),
+            projection_type=dynamodb.ProjectionType.INCLUDE,
+            non_key_attributes=active_session_attributes,
         )
+        # CloudFormation creates one GSI per table update: existing tables
+        # deploy ActiveByInstance with gateway:session-user-index false first
+        user_index = self.node.try_get_context("gateway:session-user-index") not in (
+            False,
+            "false",
+        )
+        if user_index:
+            database.add_global_secondary_index(
+                index_name="ActiveByUser",
+                partition_key=dynamodb.Attribute(
+                    name="active_username", type=dynamodb.AttributeType.STRING
+                ),
+                sort_key=dynamodb.Attribute(
+                    name="activated_at", type=dynamodb.AttributeType.NUMBER
+                ),
+                projection_type=dynamodb.ProjectionType.INCLUDE,
+                non_key_attributes=active_session_attributes,
+            )
+        # off: no logs; errors: compact access logs and execution errors;
+        # traced: errors plus X-Ray traces of a sample of requests;
+        # full: access logs and INFO execution logs with request/response data
+        logging_profile = (
+            self.node.try_get_context("gateway:api-logging-profile") or "errors"
+        )
+        if logging_profile not in API_LOGGING_PROFILES:
+            raise ValueError(
+                f"gateway:api-logging-profile must be one of {', '.join(API_LOGGING_PROFILES)}"
+            )
+        if logging_profile == "off":
+            stage_logging = {"logging_level": apigateway.MethodLoggingLevel.OFF}
+        else:
+            api_logs = logs.LogGroup(
+                self,
+                "DcvAccessManagementApiLogs",
+                removal_policy=RemovalPolicy.DESTROY,
+            )
+            stage_logging = {
+                "access_log_destination": apigateway.LogGroupLogDestination(api_logs),
+                "access_log_format": API_ACCESS_LOG_FORMAT,
+                "data_trace_enabled": logging_profile == "full",
+                "logging_level": (
+                    apigateway.MethodLoggingLevel.INFO
+                    if logging_profile == "full"
+                    else apigateway.MethodLoggingLevel.ERROR
+                ),
+                "tracing_enabled": logging_profile == "traced",
+            }
         self.api = apigateway.RestApi(
             self,
             "DcvAccessManagementApi",
@@ -72,28 +180,97 @@ class AccessManagement(Resource):
                     )
                 ]
             ),
-            deploy_options=apigateway.StageOptions(
-                stage_name="v1",
-                access_log_destination=apigateway.LogGroupLogDestination(api_logs),
-                data_trace_enabled=True,
-                logging_level=apigateway.MethodLoggingLevel.INFO,
-            ),
+            # stage wide settings, the same for every route
+            deploy_options=apigateway.StageOptions(stage_name="v1", **stage_logging),
         )
+        if logging_profile == "off":
+            NagSuppressions.add_resource_suppressions(
+                self.api.deployment_stage,
+                [
+                    {
+                        "id": "AwsSolutions-APIG1",
+                        "reason": "Access logging disabled through gateway:api-logging-profile",
+                    },
+                    {
+                        "id": "AwsSolutions-APIG6",
+                        "reason": "Logging disabled through gateway:api-logging-profile",
+                    },
+                ],
+            )
+        if logging_profile == "traced":
+            xray.CfnSamplingRule(
+                self,
+                "DcvAccessManagementApiSampling",
+                sampling_rule=xray.CfnSamplingRule.SamplingRuleProperty(
+                    rule_name=Names.unique_resource_name(self, max_length=32),
+                    priority=100,
+                    fixed_rate=float(
+                        self.node.try_get_context("gateway:api-trace-sample-rate")
+                        or 0.05
+                    ),
+                    reservoir_size=1,
+                    service_name=f"{self.api.rest_api_name}/v1",
+                    service_type="AWS::ApiGateway::Stage",
+                    host="*",
+                    http_method="*",
+                    url_path="*",
+                    resource_arn="*",
+                    version=1,
+                ),
+            )
+        # front end of the connect path (resolveSession, authenticate); the
+        # session management routes always stay on the REST API
+        frontend = self.node.try_get_context("gateway:api-frontend") or "rest"
+        if frontend not in API_FRONTENDS:
+            raise ValueError(
+                f"gateway:api-frontend must be one of {', '.join(API_FRONTENDS)}"
+            )
+        self.connect_path_load_balancer = None
+        self.connect_path_http_api = None
+        if frontend in ("alb", "http"):
+            self._add_connect_path_load_balancer(vpc)
+        if frontend == "http":
+            self._add_connect_path_http_api(vpc, logging_profile)
+
+        # boto3 clients, instance lookups, tokens and response helpers shared by
+        # all handlers, see src/common/python/dcv_common
+        runtime_layer = lambda_.LayerVersion(
+            self,
+            "RuntimeLayer",
+            code=lambda_.Code.from_asset("src/common"),
+            compatible_runtimes=[lambda_.Runtime.PYTHON_3_13],
+            compatible_architectures=[lambda_.Architecture.ARM_64],
+        )
+        # EMF metrics are on unless gateway:metrics is set to false
+        metrics_environment = {
+            "DCV_METRICS": (
+                "false"
+                if self.node.try_get_context("gateway:metrics") in (False, "false")
+                else "true"
+            ),
+        }
+        instance_cache_environment = {
+            "INSTANCE_CACHE_TTL": str(
+                int(self.node.try_get_context("gateway:instance-cache-ttl") or "300")
+            ),
+            "INSTANCE_CACHE_NEGATIVE_TTL": str(
+                int(
+                    self.node.try_get_context("gateway:instance-cache-negative-ttl")
+                    or "30"
+                )
+            ),
+            "DCV_REFRESH_INSTANCE_IP": (
+                "true"
+                if self.node.try_get_context("gateway:refresh-instance-ip")
+                else "false"
+            ),
+        }
         authenticator = lambda_.Function(
             self,
             "Authenticator",
             handler="index.handler",
-            code=lambda_.Code.from_asset(
-                "src/authenticator",
-                bundling=BundlingOptions(
-                    image=lambda_.Runtime.PYTHON_3_13.bundling_image,
-                    command=[
-                        "bash",
-                        "-c",
-                        "pip install -r requirements.txt -t /asset-output && cp -au . /asset-output",
-                    ],
-                ),
-            ),
+            code=lambda_.Code.from_asset("src/authenticator"),
+            layers=[runtime_layer],
             vpc=vpc,
             vpc_subnets=ec2.SubnetSelection(
                 subnet_type=ec2.SubnetType.PRIVATE_WITH_EGRESS
@@ -101,6 +278,14 @@ class AccessManagement(Resource):
             environment={
                 "DCV_KMS_KEY": auth_key.key_id,
                 "DCV_TABLE_NAME": database.table_name,
+                "ACTIVE_SESSION_LIFETIME": str(
+                    int(
+                        self.node.try_get_context("gateway:active-session-lifetime")
+                        or "86400"
+                    )
+                ),
+                **instance_cache_environment,
+                **metrics_environment,
             },
             runtime=lambda_.Runtime.PYTHON_3_13,
             architecture=lambda_.Architecture.ARM_64,
@@ -113,33 +298,40 @@ class AccessManagement(Resource):
         )
         auth_key.grant_decrypt(authenticator)
         database.grant_read_write_data(authenticator)
-        self.api.root.add_resource("authenticate").add_method(
-            "POST",
-            apigateway.LambdaIntegration(authenticator),
+        self._add_connect_path_route(
+            "authenticate", self._connect_path_target(authenticator, "authenticator")
         )
 
+        # shared with the resolver sidecar of the gateway hosts
+        self.resolver_environment = {
+            "DCV_TABLE_NAME": database.table_name,
+            "DCV_RESOLVER_CLIENT_AFFINITY": (
+                "true"
+                if self.node.try_get_context("gateway:resolver-client-affinity")
+                else "false"
+            ),
+            "DCV_RESOLVER_CACHE_TTL": str(
+                int(self.node.try_get_context("gateway:resolver-cache-ttl") or "10")
+            ),
+            "DCV_SESSION_CACHE_TTL": str(
+                int(self.node.try_get_context("gateway:session-cache-ttl") or "0")
+            ),
+            **instance_cache_environment,
+            **metrics_environment,
+        }
         resolver = lambda_.Function(
             self,
             "Resolver",
             handler="index.handler",
-            code=lambda_.Code.from_asset(
-                "src/resolver",
-                bundling=BundlingOptions(
-                    image=lambda_.Runtime.PYTHON_3_13.bundling_image,
-                    command=[
-                        "bash",
-                        "-c",
-                        "pip install --no-cache -r requirements.txt -t /asset-output && cp -au . /asset-output",
-                    ],
-                ),
-            ),
+            code=lambda_.Code.from_asset("src/resolver"),
+            layers=[runtime_layer],
             vpc=vpc,
             vpc_subnets=ec2.SubnetSelection(
                 subnet_type=ec2.SubnetType.PRIVATE_WITH_EGRESS
             ),
             environment={
                 "DCV_KMS_KEY": auth_key.key_id,
-                "DCV_TABLE_NAME": database.table_name,
+                **self.resolver_environment,
             },
             runtime=lambda_.Runtime.PYTHON_3_13,
             architecture=lambda_.Architecture.ARM_64,
@@ -151,27 +343,20 @@ class AccessManagement(Resource):
             ],
         )
         auth_key.grant_decrypt(resolver)
-        database.grant_read_write_data(resolver)
-        self.api.root.add_resource("resolveSession").add_method(
-            "POST",
-            apigateway.LambdaIntegration(resolver),
+        # like the gateway hosts, the resolver never reads secrets or tokens
+        grant_resolve(database, resolver)
+        if self.node.try_get_context("gateway:session-table-dax"):
+            self._add_session_cache_cluster(vpc, database, resolver)
+        self._add_connect_path_route(
+            "resolveSession", self._connect_path_target(resolver, "resolver")
         )
 
         create_session = lambda_.Function(
             self,
             "CreateSessionHandler",
             handler="index.handler",
-            code=lambda_.Code.from_asset(
-                "src/create_session",
-                bundling=BundlingOptions(
-                    image=lambda_.Runtime.PYTHON_3_13.bundling_image,
-                    command=[
-                        "bash",
-                        "-c",
-                        "pip install --no-cache -r requirements.txt -t /asset-output && cp -au . /asset-output",
-                    ],
-                ),
-            ),
+            code=lambda_.Code.from_asset("src/create_session"),
+            layers=[runtime_layer],
             vpc=vpc,
             vpc_subnets=ec2.SubnetSelection(
                 subnet_type=ec2.SubnetType.PRIVATE_WITH_EGRESS
@@ -182,9 +367,14 @@ class AccessManagement(Resource):
                 "SESSION_LIFETIME": str(
                     int(self.node.try_get_context("gateway:session-lifetime") or "3600")
                 ),
+                "DCV_TOKEN_MODE": self.node.try_get_context("gateway:token-mode")
+                or "kms",
+                **metrics_environment,
             },
             runtime=lambda_.Runtime.PYTHON_3_13,
             architecture=lambda_.Architecture.ARM_64,
+            # batch requests mint and store hundreds of sessions in one call
+            timeout=Duration.seconds(29),
             initial_policy=[
                 iam.PolicyStatement(
                     actions=["ec2:DescribeInstances"],
@@ -194,12 +384,56 @@ class AccessManagement(Resource):
         )
         auth_key.grant_encrypt(create_session)
         database.grant_read_write_data(create_session)
-        self.api.root.add_resource("session").add_method(
+        session_resource = self.api.root.add_resource("session")
+        session_resource.add_method(
+            "POST",
+            apigateway.LambdaIntegration(create_session),
+            authorization_type=apigateway.AuthorizationType.IAM,
+        )
+        sessions_resource = self.api.root.add_resource("sessions")
+        sessions_resource.add_method(
             "POST",
             apigateway.LambdaIntegration(create_session),
             authorization_type=apigateway.AuthorizationType.IAM,
         )
 
+        sessions_handler = lambda_.Function(
+            self,
+            "SessionsHandler",
+            handler="index.handler",
+            code=lambda_.Code.from_asset("src/sessions"),
+            layers=[runtime_layer],
+            vpc=vpc,
+            vpc_subnets=ec2.SubnetSelection(
+                subnet_type=ec2.SubnetType.PRIVATE_WITH_EGRESS
+            ),
+            environment={
+                "DCV_TABLE_NAME": database.table_name,
+                "DCV_USER_INDEX": "true" if user_index else "false",
+                **metrics_environment,
+            },
+            runtime=lambda_.Runtime.PYTHON_3_13,
+            architecture=lambda_.Architecture.ARM_64,
+        )
+        # listing only queries the active session indexes, it never scans
+        sessions_handler.add_to_role_policy(
+            iam.PolicyStatement(
+                actions=["dynamodb:Query"],
+                resources=[f"{database.table_arn}/index/*"],
+            )
+        )
+        database.grant(sessions_handler, "dynamodb:DeleteItem")
+        sessions_resource.add_method(
+            "GET",
+            apigateway.LambdaIntegration(sessions_handler),
+            authorization_type=apigateway.AuthorizationType.IAM,
+        )
+        session_resource.add_resource("{id}").add_method(
+            "DELETE",
+            apigateway.LambdaIntegration(sessions_handler),
+            authorization_type=apigateway.AuthorizationType.IAM,
+        )
+
         # cdk supressions
         NagSuppressions.add_resource_suppressions(
             self.api,
@@ -208,10 +442,6 @@ class AccessManagement(Resource):
                     "id": "AwsSolutions-APIG2",
                     "reason": "Request validation not required for this internal API",
                 },
-                {
-                    "id": "AwsSolutions-APIG1",
-                    "reason": "Access logging not required for sample environment",
-                },
                 {
                     "id": "AwsSolutions-APIG3",
                     "reason": "WAF not required for sample environment",
@@ -235,6 +465,7 @@ class AccessManagement(Resource):
                 f"/{Stack.of(self).stack_name}/AccessManagement/Authenticator/ServiceRole/Resource",
                 f"/{Stack.of(self).stack_name}/AccessManagement/Resolver/ServiceRole/Resource",
                 f"/{Stack.of(self).stack_name}/AccessManagement/CreateSessionHandler/ServiceRole/Resource",
+                f"/{Stack.of(self).stack_name}/AccessManagement/SessionsHandler/ServiceRole/Resource",
             ],
             [
                 {
@@ -251,6 +482,7 @@ class AccessManagement(Resource):
                 f"/{Stack.of(self).stack_name}/AccessManagement/Authenticator/ServiceRole/DefaultPolicy/Resource",
                 f"/{Stack.of(self).stack_name}/AccessManagement/Resolver/ServiceRole/DefaultPolicy/Resource",
                 f"/{Stack.of(self).stack_name}/AccessManagement/CreateSessionHandler/ServiceRole/DefaultPolicy/Resource",
+                f"/{Stack.of(self).stack_name}/AccessManagement/SessionsHandler/ServiceRole/DefaultPolicy/Resource",
             ],
             [
                 {
@@ -260,6 +492,344 @@ class AccessManagement(Resource):
             ],
         )
 
+    def _connect_path_target(
+        self, function: lambda_.Function, name: str
+    ) -> lambda_.IFunction:
+        """Returns a provisioned concurrency alias when configured for the function.
+
+        Reads gateway:<name>-provisioned-concurrency and, for scheduled scaling
+        around business hours, the shared gateway:provisioned-concurrency-*
+        schedule, off-hours and time zone context values.
+        """
+        concurrency = int(
+            self.node.try_get_context(f"gateway:{name}-provisioned-concurrency") or 0
+        )
+        if concurrency <= 0:
+            return function
+
+        alias = lambda_.Alias(
+            self,
+            f"{function.node.id}Live",
+            alias_name="live",
+            version=function.current_version,
+            provisioned_concurrent_executions=concurrency,
+        )
+
+        scale_up = self.node.try_get_context(
+            "gateway:provisioned-concurrency-scale-up-schedule"
+        )
+        scale_down = self.node.try_get_context(
+            "gateway:provisioned-concurrency-scale-down-schedule"
+        )
+        if scale_up and scale_down:
+            off_hours = int(
+                self.node.try_get_context("gateway:provisioned-concurrency-off-hours")
+                or 0
+            )
+            time_zone = self.node.try_get_context(
+                "gateway:provisioned-concurrency-time-zone"
+            )
+            scaling = alias.add_auto_scaling(
+                min_capacity=off_hours, max_capacity=concurrency
+            )
+            scaling.scale_on_schedule(
+                "BusinessHoursStart",
+                schedule=appscaling.Schedule.expression(scale_up),
+                min_capacity=concurrency,
+                max_capacity=concurrency,
+                time_zone=TimeZone.of(time_zone) if time_zone else None,
+            )
+            scaling.scale_on_schedule(
+                "BusinessHoursEnd",
+                schedule=appscaling.Schedule.expression(scale_down),
+                min_capacity=off_hours,
+                max_capacity=off_hours,
+                time_zone=TimeZone.of(time_zone) if time_zone else None,
+            )
+        return alias
+
+    def _add_session_cache_cluster(
+        self, vpc: ec2.IVpc, database: dynamodb.Table, resolver: lambda_.Function
+    ) -> None:
+        """Fronts the resolver's session reads with a DAX cluster.
+
+        Only the resolver reads through DAX; activation and client binding
+        writes keep going to the table. Node type and replication factor come
+        from gateway:dax-node-type and gateway:dax-replication-factor.
+        """
+        security_group = ec2.SecurityGroup(
+            self,
+            "SessionCacheSecurityGroup",
+            vpc=vpc,
+            description="DAX cluster in front of the session table",
+            allow_all_outbound=False,
+        )
+        security_group.connections.allow_from(resolver, ec2.Port.tcp(9111))
+        subnet_group = dax.CfnSubnetGroup(
+            self,
+            "SessionCacheSubnetGroup",
+            subnet_ids=vpc.select_subnets(
+                subnet_type=ec2.SubnetType.PRIVATE_WITH_EGRESS
+            ).subnet_ids,
+        )
+        role = iam.Role(
+            self,
+            "SessionCacheRole",
+            assumed_by=iam.ServicePrincipal("dax.amazonaws.com"),
+        )
+        database.grant_read_data(role)
+        NagSuppressions.add_resource_suppressions(
+            role,
+            [
+                {
+                    "id": "AwsSolutions-IAM5",
+                    "reason": "DAX reads through the table and its indexes, which are covered by the index wildcard",
+                }
+            ],
+            apply_to_children=True,
+        )
+        cluster = dax.CfnCluster(
+            self,
+            "SessionCache",
+            iam_role_arn=role.role_arn,
+            node_type=self.node.try_get_context("gateway:dax-node-type")
+            or "dax.t3.small",
+            replication_factor=int(
+                self.node.try_get_context("gateway:dax-replication-factor") or 2
+            ),
+            security_group_ids=[security_group.security_group_id],
+            subnet_group_name=subnet_group.ref,
+            sse_specification=dax.CfnCluster.SSESpecificationProperty(sse_enabled=True),
+            cluster_endpoint_encryption_type="TLS",
+        )
+        # the DAX client is not part of the runtime layer, only the resolver
+        # needs it and only with DAX enabled
+        dax_client_layer = lambda_.LayerVersion(
+            self,
+            "DaxClientLayer",
+            code=lambda_.Code.from_asset(
+                "src/dax_client",
+                bundling=BundlingOptions(
+                    image=lambda_.Runtime.PYTHON_3_13.bundling_image,
+                    command=[
+                        "bash",
+                        "-c",
+                        "pip install --no-cache -r requirements.txt -t /asset-output/python",
+                    ],
+                ),
+            ),
+            compatible_runtimes=[lambda_.Runtime.PYTHON_3_13],
+            compatible_architectures=[lambda_.Architecture.ARM_64],
+        )
+        resolver.add_layers(dax_client_layer)
+        resolver.add_environment(
+            "DCV_DAX_ENDPOINT", cluster.attr_cluster_discovery_endpoint_url
+        )
+        resolver.add_to_role_policy(
+            iam.PolicyStatement(
+                actions=["dax:GetItem"],
+                resources=[cluster.attr_arn],
+            )
+        )
+
+    def _add_connect_path_load_balancer(self, vpc: ec2.IVpc) -> None:
+        """Creates an internal ALB serving the connect path routes over HTTPS.
+
+        gateway:api-frontend-certificate-arn is an ACM certificate for
+        gateway:api-frontend-domain-name, which gets an alias record in the
+        private hosted zone gateway:api-frontend-hosted-zone-id. The gateway
+        and the DCV servers verify the certificate against that name.
+        """
+        settings = {
+            name: self.node.try_get_context(f"gateway:api-frontend-{name}")
+            for name in ("certificate-arn", "domain-name", "hosted-zone-id")
+        }
+        missing = [f"gateway:api-frontend-{n}" for n, v in settings.items() if not v]
+        if missing:
+            raise ValueError(
+                f"gateway:api-frontend alb and http require {', '.join(missing)}"
+            )
+        self._connect_path_domain_name = settings["domain-name"]
+
+        security_group = ec2.SecurityGroup(
+            self,
+            "ConnectPathLoadBalancerSecurityGroup",
+            vpc=vpc,
+            description="Connect path ALB for the gateway and DCV servers",
+            allow_all_outbound=False,
+        )
+        security_group.add_ingress_rule(
+            peer=ec2.Peer.ipv4(vpc.vpc_cidr_block),
+            connection=ec2.Port.tcp(443),
+            description="Allow HTTPS from the VPC",
+        )
+        self.connect_path_load_balancer = elbv2.ApplicationLoadBalancer(
+            self,
+            "ConnectPathLoadBalancer",
+            vpc=vpc,
+            vpc_subnets=ec2.SubnetSelection(
+                subnet_type=ec2.SubnetType.PRIVATE_WITH_EGRESS
+            ),
+            internet_facing=False,
+            security_group=security_group,
+        )
+        self._connect_path_listener = self.connect_path_load_balancer.add_listener(
+            "Https",
+            port=443,
+            open=False,
+            certificates=[
+                elbv2.ListenerCertificate.from_certificate_manager(
+                    acm.Certificate.from_certificate_arn(
+                        self,
+                        "ConnectPathCertificate",
+                        settings["certificate-arn"],
+                    )
+                )
+            ],
+            ssl_policy=elbv2.SslPolicy.RECOMMENDED_TLS,
+            default_action=elbv2.ListenerAction.fixed_response(404),
+        )
+        self._connect_path_routes = []
+        route53.ARecord(
+            self,
+            "ConnectPathRecord",
+            # the trailing dot makes the name absolute, so the zone's name
+            # is not needed
+            record_name=f"{settings['domain-name']}.",
+            zone=route53.HostedZone.from_hosted_zone_id(
+                self, "ConnectPathZone", settings["hosted-zone-id"]
+            ),
+            target=route53.RecordTarget.from_alias(
+                route53_targets.LoadBalancerTarget(self.connect_path_load_balancer)
+            ),
+        )
+        NagSuppressions.add_resource_suppressions(
+            self.connect_path_load_balancer,
+            [
+                {
+                    "id": "AwsSolutions-ELB2",
+                    "reason": "Requests are recorded by the handlers' metrics, access logs not required for sample environment",
+                },
+            ],
+        )
+
+    def _add_connect_path_http_api(self, vpc: ec2.IVpc, logging_profile: str) -> None:
+        """Creates an HTTP API forwarding resolveSession to the internal ALB.
+
+        The API reaches the ALB's HTTPS listener through a VPC link. HTTP APIs
+        have no private endpoint, so the API is reachable from the internet.
+        authenticate stays on the ALB: the authenticator checks that the
+        caller is the session's DCV server, whose private IP only the ALB
+        sees.
+        """
+        security_group = ec2.SecurityGroup(
+            self,
+            "ConnectPathVpcLinkSecurityGroup",
+            vpc=vpc,
+            description="VPC link of the connect path HTTP API",
+            allow_all_outbound=False,
+        )
+        security_group.connections.allow_to(
+            self.connect_path_load_balancer, ec2.Port.tcp(443)
+        )
+        vpc_link = apigatewayv2.VpcLink(
+            self,
+            "ConnectPathVpcLink",
+            vpc=vpc,
+            subnets=ec2.SubnetSelection(subnet_type=ec2.SubnetType.PRIVATE_WITH_EGRESS),
+            security_groups=[security_group],
+        )
+        self.connect_path_http_api = apigatewayv2.HttpApi(
+            self, "ConnectPathHttpApi", create_default_stage=True
+        )
+        self.connect_path_http_api.add_routes(
+            path="/resolveSession",
+            methods=[apigatewayv2.HttpMethod.POST],
+            integration=apigatewayv2_integrations.HttpAlbIntegration(
+                "ResolveSession",
+                self._connect_path_listener,
+                vpc_link=vpc_link,
+                # verify the ALB certificate against the name it was issued for
+                secure_server_name=self._connect_path_domain_name,
+            ),
+        )
+        stage = self.connect_path_http_api.default_stage.node.default_child
+        if logging_profile == "off":
+            NagSuppressions.add_resource_suppressions(
+                stage,
+                [
+                    {
+                        "id": "AwsSolutions-APIG1",
+                        "reason": "Access logging disabled through gateway:api-logging-profile",
+                    },
+                ],
+            )
+        else:
+            http_api_logs = logs.LogGroup(
+                self,
+                "ConnectPathHttpApiLogs",
+                removal_policy=RemovalPolicy.DESTROY,
+            )
+            stage.access_log_settings = apigatewayv2.CfnStage.AccessLogSettingsProperty(
+                destination_arn=http_api_logs.log_group_arn,
+                format=json.dumps(
+                    {
+                        "requestId": "$context.requestId",
+                        "time": "$context.requestTimeEpoch",
+                        "ip": "$context.identity.sourceIp",
+                        "method": "$context.httpMethod",
+                        "resource": "$context.routeKey",
+                        "status": "$context.status",
+                        "latency": "$context.responseLatency",
+                        "integrationLatency": "$context.integrationLatency",
+                        "error": "$context.integrationErrorMessage",
+                    }
+                ),
+            )
+        NagSuppressions.add_resource_suppressions(
+            self.connect_path_http_api,
+            [
+                {
+                    "id": "AwsSolutions-APIG4",
+                    "reason": "The gateway cannot sign resolver requests, sessions are only resolved by their unguessable id",
+                },
+            ],
+            apply_to_children=True,
+        )
+
+    def _add_connect_path_route(self, path: str, target: lambda_.IFunction) -> None:
+        """Routes POST /<path> to the target on the configured front end."""
+        if self.connect_path_load_balancer is None:
+            self.api.root.add_resource(path).add_method(
+                "POST", apigateway.LambdaIntegration(target)
+            )
+            return
+
+        self._connect_path_routes.append(path)
+        self._connect_path_listener.add_targets(
+            f"{path[0].upper()}{path[1:]}",
+            priority=len(self._connect_path_routes),
+            conditions=[
+                elbv2.ListenerCondition.path_patterns([f"/{path}"]),
+                elbv2.ListenerCondition.http_request_methods(["POST"]),
+            ],
+            targets=[elbv2_targets.LambdaTarget(target)],
+        )
+
     @property
     def url(self) -> str:
         return self.api.url
+
+    @property
+    def resolver_url(self) -> str:
+        if self.connect_path_http_api is not None:
+            return self.connect_path_http_api.api_endpoint
+        if self.connect_path_load_balancer is not None:
+            return f"https://{self._connect_path_domain_name}"
+        return self.api.url
+
+    @property
+    def authenticator_url(self) -> str:
+        if self.connect_path_load_balancer is not None:
+            return f"https://{self._connect_path_domain_name}/authenticate"
+        return f"{self.api.url}/authenticate"
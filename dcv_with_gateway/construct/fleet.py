@@ -0,0 +1,72 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""Instance types of the gateway and server fleets, read from context.
+
+Every fleet reads its values under a context prefix (gateway: for the
+gateways, server:linux- and server:windows- for the servers):
+
+    <prefix>instance-types         instance types, in order of preference
+    <prefix>on-demand-base-capacity  instances always launched on demand
+    <prefix>on-demand-percentage   share of the instances above the base
+                                   launched on demand, the rest on spot
+"""
+
+from typing import Any, Dict, List
+
+from aws_cdk import (
+    aws_autoscaling as autoscaling,
+    aws_ec2 as ec2,
+)
+from constructs import Node
+
+
+def fleet_instance_types(
+    node: Node, prefix: str, default: str
+) -> List[ec2.InstanceType]:
+    """Returns the fleet's instance types, all of one architecture."""
+    names = node.try_get_context(f"{prefix}instance-types") or [default]
+    if isinstance(names, str):
+        names = [name.strip() for name in names.split(",")]
+    instance_types = [ec2.InstanceType(name) for name in names]
+    if len({instance_type.architecture for instance_type in instance_types}) > 1:
+        raise ValueError(
+            f"{prefix}instance-types must share one architecture, got {names}"
+        )
+    return instance_types
+
+
+def fleet_launch(
+    node: Node,
+    prefix: str,
+    launch_template: ec2.ILaunchTemplate,
+    instance_types: List[ec2.InstanceType],
+) -> Dict[str, Any]:
+    """Returns the AutoScalingGroup props launching the fleet.
+
+    A single on-demand instance type launches from the launch template as is;
+    several instance types or spot capacity use a mixed instances policy.
+    """
+    base_capacity = int(node.try_get_context(f"{prefix}on-demand-base-capacity") or 0)
+    percentage = node.try_get_context(f"{prefix}on-demand-percentage")
+    percentage = 100 if percentage in (None, "") else int(percentage)
+    if len(instance_types) == 1 and percentage == 100:
+        return {"launch_template": launch_template}
+
+    return {
+        "mixed_instances_policy": autoscaling.MixedInstancesPolicy(
+            launch_template=launch_template,
+            launch_template_overrides=[
+                autoscaling.LaunchTemplateOverrides(instance_type=instance_type)
+                for instance_type in instance_types
+            ],
+            instances_distribution=autoscaling.InstancesDistribution(
+                on_demand_allocation_strategy=autoscaling.OnDemandAllocationStrategy.PRIORITIZED,
+                on_demand_base_capacity=base_capacity,
+                on_demand_percentage_above_base_capacity=percentage,
+                spot_allocation_strategy=autoscaling.SpotAllocationStrategy.PRICE_CAPACITY_OPTIMIZED,
+            ),
+        ),
+        # replace spot instances at risk of interruption ahead of time
+        "capacity_rebalance": percentage < 100,
+    }
@@ -2,19 +2,40 @@
 # SPDX-License-Identifier: MIT-0
 
 from string import Template
+from typing import Dict, Optional
 from aws_cdk import (
+    ArnFormat,
+    Aws,
     Resource,
     aws_ec2 as ec2,
     aws_elasticloadbalancingv2 as elbv2,
     aws_iam as iam,
     aws_autoscaling as autoscaling,
+    aws_dynamodb as dynamodb,
+    aws_s3_assets as s3_assets,
+    aws_cloudwatch as cloudwatch,
     Duration,
+    Stack,
     Tags,
     CfnOutput,
 )
 from constructs import Construct
 from cdk_nag import NagSuppressions
 
+from dcv_with_gateway.construct.fleet import fleet_instance_types, fleet_launch
+from dcv_with_gateway.construct.gateway_config import GatewayConfig
+from dcv_with_gateway.construct.gateway_image import GatewayImage
+from dcv_with_gateway.construct.session_table import grant_resolve
+
+RESOLVER_SIDECAR_PORT = 8445
+# time a new gateway takes to take connections, before its metrics count
+SCALING_WARMUP = Duration.minutes(3)
+DRAIN_HOOK_NAME = "gateway-drain"
+AMAZON_LINUX_CPU_TYPES = {
+    ec2.InstanceArchitecture.ARM_64: ec2.AmazonLinuxCpuType.ARM_64,
+    ec2.InstanceArchitecture.X86_64: ec2.AmazonLinuxCpuType.X86_64,
+}
+
 
 class Gateway(Resource):
 
@@ -24,10 +45,14 @@ class Gateway(Resource):
         construct_id: str,
         vpc: ec2.IVpc,
         resolver_url: str,
+        session_table: Optional[dynamodb.ITable] = None,
+        resolver_environment: Optional[Dict[str, str]] = None,
         **kwargs,
     ) -> None:
         super().__init__(scope, construct_id, **kwargs)
 
+        drain_timeout = int(self.node.try_get_context("gateway:drain-timeout") or 900)
+
         self.gateway_iam_role = iam.Role(
             self,
             "GatewayRole",
@@ -66,6 +91,8 @@ class Gateway(Resource):
             protocol=elbv2.Protocol.TCP_UDP,
             preserve_client_ip=True,
             target_type=elbv2.TargetType.INSTANCE,
+            # the drain agent decides when a leaving gateway has no more users
+            deregistration_delay=Duration.seconds(drain_timeout),
             health_check=elbv2.HealthCheck(
                 enabled=True,
                 port="8989",
@@ -103,12 +130,54 @@ class Gateway(Resource):
             "Allow NLB UDP traffic",
         )
 
-        ami = ec2.MachineImage.latest_amazon_linux2(
-            cpu_type=ec2.AmazonLinuxCpuType.ARM_64
-        )
+        instance_types = fleet_instance_types(self.node, "gateway:", "c7g.large")
+        instance_type = instance_types[0]
+        prebaked = bool(self.node.try_get_context("gateway:prebaked-ami"))
+        if prebaked:
+            ami = GatewayImage(
+                self, "Image", vpc=vpc, instance_type=instance_type
+            ).machine_image
+        else:
+            ami = ec2.MachineImage.latest_amazon_linux2(
+                cpu_type=AMAZON_LINUX_CPU_TYPES[instance_type.architecture]
+            )
 
+        resolver_sidecar = {
+            "RESOLVER_SIDECAR": "false",
+            "RESOLVER_SIDECAR_ASSET_URL": "",
+            "RESOLVER_SIDECAR_ENVIRONMENT": "",
+        }
+        if self.node.try_get_context("gateway:resolver-sidecar"):
+            resolver_sidecar = self._add_resolver_sidecar(
+                session_table, resolver_environment or {}
+            )
+            resolver_url = f"http://127.0.0.1:{RESOLVER_SIDECAR_PORT}"
+
+        self.config = GatewayConfig.from_context(self.node, resolver_url)
+
+        user_data = ""
+        if not prebaked:
+            with open("scripts/gateway/install.linux.sh", "r") as f:
+                user_data = f.read() + "\n"
         with open("scripts/gateway/user_data.linux.sh", "r") as f:
-            user_data = Template(f.read()).safe_substitute(RESOLVER_URL=resolver_url)
+            user_data = Template(user_data + f.read()).safe_substitute(
+                GATEWAY_CONFIG=self.config.render(),
+                GATEWAY_SYSCTLS="\n".join(
+                    f"{name} = {value}" for name, value in self.config.sysctls().items()
+                ),
+                GATEWAY_IMAGE="prebaked" if prebaked else "installed",
+                BOOT_METRIC=(
+                    "false"
+                    if self.node.try_get_context("gateway:metrics") in (False, "false")
+                    else "true"
+                ),
+                DRAIN_HOOK_NAME=DRAIN_HOOK_NAME,
+                DRAIN_TIMEOUT=drain_timeout,
+                DRAIN_CONNECTION_THRESHOLD=int(
+                    self.node.try_get_context("gateway:drain-connection-threshold") or 0
+                ),
+                **resolver_sidecar,
+            )
 
         self.launch_template = ec2.LaunchTemplate(
             self,
@@ -117,14 +186,18 @@ class Gateway(Resource):
             user_data=ec2.UserData.custom(user_data),
             machine_image=ami,
             role=self.gateway_iam_role,
-            instance_type=ec2.InstanceType.of(
-                ec2.InstanceClass.C7G, ec2.InstanceSize.LARGE
-            ),
+            instance_type=instance_type,
             associate_public_ip_address=False,
             launch_template_name=f"{self.node.path}/gateway",
             require_imdsv2=True,
         )
 
+        self.asg_min_capacity = int(
+            self.node.try_get_context("gateway:min-capacity") or 1
+        )
+        self.asg_max_capacity = int(
+            self.node.try_get_context("gateway:max-capacity") or 2
+        )
         self.asg = autoscaling.AutoScalingGroup(
             self,
             "ASG",
@@ -132,15 +205,27 @@ class Gateway(Resource):
             vpc_subnets=ec2.SubnetSelection(
                 subnet_type=ec2.SubnetType.PRIVATE_WITH_EGRESS
             ),
-            min_capacity=int(self.node.try_get_context("gateway:min-capacity") or 1),
-            max_capacity=int(self.node.try_get_context("gateway:max-capacity") or 2),
-            launch_template=self.launch_template,
+            min_capacity=self.asg_min_capacity,
+            max_capacity=self.asg_max_capacity,
+            **fleet_launch(self.node, "gateway:", self.launch_template, instance_types),
             health_check=autoscaling.HealthCheck.ec2(grace=Duration.minutes(1)),
         )
         Tags.of(self.asg).add("dcv:type", "gateway")
 
         self.asg.attach_to_network_target_group(self.nlb_target_group)
 
+        self._add_drain_hook(drain_timeout)
+
+        self.gateway_iam_role.add_to_policy(
+            iam.PolicyStatement(
+                actions=["cloudwatch:PutMetricData"],
+                resources=["*"],
+                conditions={"StringEquals": {"cloudwatch:namespace": "DcvWithGateway"}},
+            )
+        )
+
+        self._add_scaling_policies()
+
         # CDK supressions
         NagSuppressions.add_resource_suppressions(
             self.gateway_iam_role,
@@ -172,6 +257,226 @@ class Gateway(Resource):
             ],
         )
 
+    def _add_drain_hook(self, drain_timeout: int) -> None:
+        """Holds terminating gateways until their drain agent lets them go.
+
+        The agent installed by the user data completes the hook once open
+        connections fall to gateway:drain-connection-threshold, or after
+        gateway:drain-timeout seconds; the hook continues on its own a minute
+        later should the agent not answer.
+        """
+        self.asg.add_lifecycle_hook(
+            "DrainHook",
+            lifecycle_hook_name=DRAIN_HOOK_NAME,
+            lifecycle_transition=autoscaling.LifecycleTransition.INSTANCE_TERMINATING,
+            heartbeat_timeout=Duration.seconds(drain_timeout + 60),
+            default_result=autoscaling.DefaultResult.CONTINUE,
+        )
+        # not in the role's default policy, which the launch template and so
+        # the Auto Scaling group depend on
+        drain_policy = iam.Policy(
+            self,
+            "DrainPolicy",
+            roles=[self.gateway_iam_role],
+            statements=[
+                iam.PolicyStatement(
+                    actions=["autoscaling:CompleteLifecycleAction"],
+                    resources=[
+                        Stack.of(self).format_arn(
+                            service="autoscaling",
+                            resource="autoScalingGroup",
+                            arn_format=ArnFormat.COLON_RESOURCE_NAME,
+                            resource_name=(
+                                f"*:autoScalingGroupName/{self.asg.auto_scaling_group_name}"
+                            ),
+                        )
+                    ],
+                )
+            ],
+        )
+        NagSuppressions.add_resource_suppressions(
+            drain_policy,
+            [
+                {
+                    "id": "AwsSolutions-IAM5",
+                    "reason": "Auto Scaling group ARNs hold a generated id, the group is named",
+                }
+            ],
+        )
+        self.gateway_iam_role.add_to_policy(
+            iam.PolicyStatement(
+                actions=["autoscaling:DescribeAutoScalingInstances"],
+                resources=["*"],
+            )
+        )
+        NagSuppressions.add_resource_suppressions(
+            self.gateway_iam_role,
+            [
+                {
+                    "id": "AwsSolutions-IAM5",
+                    "reason": "Drain agent looks up the Auto Scaling group of its own instance, gateways publish their boot time metric",
+                }
+            ],
+            apply_to_children=True,
+        )
+
+    def _add_scaling_policies(self) -> None:
+        """Scales the gateway fleet between its min and max capacity.
+
+        Tracks gateway:cpu-target-utilization and, when set, steps on NLB
+        active flows (gateway:active-flows-per-instance) and throughput
+        (gateway:processed-mbps-per-instance) per healthy gateway: one more
+        gateway above the value, two above twice the value, one less below
+        half of it. gateway:prescale-schedule raises the min capacity to
+        gateway:prescale-min-capacity ahead of login waves, until
+        gateway:prescale-end-schedule.
+        """
+        cpu_target = float(
+            self.node.try_get_context("gateway:cpu-target-utilization") or 60
+        )
+        if cpu_target > 0:
+            self.asg.scale_on_cpu_utilization(
+                "CpuScaling",
+                target_utilization_percent=cpu_target,
+                estimated_instance_warmup=SCALING_WARMUP,
+            )
+
+        healthy_hosts = self.nlb_target_group.metrics.healthy_host_count(
+            period=Duration.minutes(1), statistic="Minimum"
+        )
+        flows_per_instance = float(
+            self.node.try_get_context("gateway:active-flows-per-instance") or 0
+        )
+        if flows_per_instance > 0:
+            self._scale_on_load(
+                "ActiveFlowScaling",
+                cloudwatch.MathExpression(
+                    expression="flows / MAX([hosts, 1])",
+                    using_metrics={
+                        "flows": self.nlb.metrics.active_flow_count(
+                            period=Duration.minutes(1)
+                        ),
+                        "hosts": healthy_hosts,
+                    },
+                    label="Active flows per gateway",
+                    period=Duration.minutes(1),
+                ),
+                flows_per_instance,
+            )
+        mbps_per_instance = float(
+            self.node.try_get_context("gateway:processed-mbps-per-instance") or 0
+        )
+        if mbps_per_instance > 0:
+            self._scale_on_load(
+                "ProcessedBytesScaling",
+                cloudwatch.MathExpression(
+                    expression="bytes * 8 / 60 / 1000000 / MAX([hosts, 1])",
+                    using_metrics={
+                        "bytes": self.nlb.metrics.processed_bytes(
+                            period=Duration.minutes(1)
+                        ),
+                        "hosts": healthy_hosts,
+                    },
+                    label="Processed Mbps per gateway",
+                    period=Duration.minutes(1),
+                ),
+                mbps_per_instance,
+            )
+
+        prescale = self.node.try_get_context("gateway:prescale-schedule")
+        prescale_end = self.node.try_get_context("gateway:prescale-end-schedule")
+        if prescale and prescale_end:
+            time_zone = self.node.try_get_context("gateway:prescale-time-zone")
+            self.asg.scale_on_schedule(
+                "PrescaleStart",
+                schedule=autoscaling.Schedule.expression(prescale),
+                min_capacity=int(
+                    self.node.try_get_context("gateway:prescale-min-capacity")
+                    or self.asg_max_capacity
+                ),
+                time_zone=time_zone,
+            )
+            self.asg.scale_on_schedule(
+                "PrescaleEnd",
+                schedule=autoscaling.Schedule.expression(prescale_end),
+                min_capacity=self.asg_min_capacity,
+                time_zone=time_zone,
+            )
+
+    def _scale_on_load(
+        self, construct_id: str, metric: cloudwatch.IMetric, threshold: float
+    ) -> None:
+        self.asg.scale_on_metric(
+            construct_id,
+            metric=metric,
+            scaling_steps=[
+                autoscaling.ScalingInterval(upper=threshold / 2, change=-1),
+                autoscaling.ScalingInterval(lower=threshold, change=+1),
+                autoscaling.ScalingInterval(lower=threshold * 2, change=+2),
+            ],
+            adjustment_type=autoscaling.AdjustmentType.CHANGE_IN_CAPACITY,
+            estimated_instance_warmup=SCALING_WARMUP,
+        )
+
+    def _add_resolver_sidecar(
+        self, session_table: dynamodb.ITable, resolver_environment: Dict[str, str]
+    ) -> Dict[str, str]:
+        """Grants the gateway hosts what the resolver sidecar needs.
+
+        Returns the user data values installing it: the sidecar and the
+        resolver code from src, and its environment, which is the resolver
+        function's with a session cache on by default.
+        """
+        asset = s3_assets.Asset(
+            self,
+            "ResolverSidecar",
+            path="src",
+            exclude=[
+                "authenticator",
+                "create_session",
+                "dax_client",
+                "sessions",
+                "**/__pycache__",
+            ],
+        )
+        asset.grant_read(self.gateway_iam_role)
+        # the gateway hosts face the internet: they may read what resolving
+        # needs and bind clients, but never read session secrets
+        grant_resolve(session_table, self.gateway_iam_role)
+        self.gateway_iam_role.add_to_policy(
+            iam.PolicyStatement(
+                actions=["ec2:DescribeInstances"],
+                resources=["*"],
+            )
+        )
+        NagSuppressions.add_resource_suppressions(
+            self.gateway_iam_role,
+            [
+                {
+                    "id": "AwsSolutions-IAM5",
+                    "reason": "Resolver sidecar reads its code asset and describes DCV server instances",
+                }
+            ],
+            apply_to_children=True,
+        )
+
+        environment = {
+            **resolver_environment,
+            "AWS_DEFAULT_REGION": Aws.REGION,
+            "DCV_SESSION_CACHE_TTL": str(
+                int(self.node.try_get_context("gateway:session-cache-ttl") or "60")
+            ),
+            "DCV_METRICS": "false",
+            "DCV_RESOLVER_SIDECAR_PORT": str(RESOLVER_SIDECAR_PORT),
+        }
+        return {
+            "RESOLVER_SIDECAR": "true",
+            "RESOLVER_SIDECAR_ASSET_URL": asset.s3_object_url,
+            "RESOLVER_SIDECAR_ENVIRONMENT": "\n".join(
+                f"{name}={value}" for name, value in environment.items()
+            ),
+        }
+
     def add_ingress_rule(
         self, peer: ec2.IPeer, port: ec2.Port, description: str = None
     ):
@@ -0,0 +1,134 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""DCV Connection Gateway configuration rendered into the gateway user data.
+
+Performance settings are read from gateway: context values and only written
+when set, so the gateway defaults apply otherwise. Any other setting can be
+given through gateway:config-overrides as {"section": {"key": value}}.
+"""
+
+import json
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from constructs import Node
+
+GATEWAY_PORT = 8443
+HEALTH_CHECK_PORT = 8989
+
+COMMENTS = {
+    ("health-check", "bind-addr"): "note this is TCP and not HTTP endpoint",
+    ("dcv", "tls-strict"): (
+        "@TODO for production deployments use private certificate registry"
+    ),
+}
+
+
+@dataclass
+class Listener:
+    endpoint: str
+    quic: bool = True
+
+
+def default_listeners() -> List[Listener]:
+    return [Listener("0.0.0.0"), Listener("::")]
+
+
+@dataclass
+class GatewayConfig:
+    resolver_url: str
+    listeners: List[Listener] = field(default_factory=default_listeners)
+    max_concurrent_clients: Optional[int] = None
+    resolver_cache_ttl: Optional[int] = None
+    socket_buffer_bytes: Optional[int] = None
+    overrides: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+
+    @classmethod
+    def from_context(cls, node: Node, resolver_url: str) -> "GatewayConfig":
+        """Reads the configuration from gateway: context values.
+
+        gateway:listeners maps listen endpoints to {"quic": bool}, e.g.
+        {"0.0.0.0": {"quic": true}, "::": {"quic": false}}.
+        """
+
+        def optional_int(name):
+            value = node.try_get_context(f"gateway:{name}")
+            return None if value in (None, "") else int(value)
+
+        listeners = node.try_get_context("gateway:listeners")
+        return cls(
+            resolver_url=resolver_url,
+            listeners=(
+                [
+                    Listener(endpoint, quic=options.get("quic", True) is True)
+                    for endpoint, options in listeners.items()
+                ]
+                if listeners
+                else default_listeners()
+            ),
+            max_concurrent_clients=optional_int("max-concurrent-clients"),
+            resolver_cache_ttl=optional_int("host-resolver-cache-ttl"),
+            socket_buffer_bytes=optional_int("socket-buffer-bytes"),
+            overrides=node.try_get_context("gateway:config-overrides") or {},
+        )
+
+    def sections(self) -> Dict[str, Dict[str, Any]]:
+        gateway = {
+            "quic-listen-endpoints": [
+                listener.endpoint for listener in self.listeners if listener.quic
+            ],
+            "quic-port": GATEWAY_PORT,
+            "web-listen-endpoints": [listener.endpoint for listener in self.listeners],
+            "web-port": GATEWAY_PORT,
+        }
+        if self.max_concurrent_clients is not None:
+            gateway["max-concurrent-clients"] = self.max_concurrent_clients
+        resolver = {"url": self.resolver_url}
+        if self.resolver_cache_ttl is not None:
+            resolver["cache-ttl"] = self.resolver_cache_ttl
+
+        sections = {
+            "gateway": gateway,
+            "health-check": {"bind-addr": "0.0.0.0", "port": HEALTH_CHECK_PORT},
+            "dcv": {"tls-strict": False},
+            "resolver": resolver,
+            "web-resources": {"local-resources-path": "/usr/share/dcv/www"},
+        }
+        for section, values in self.overrides.items():
+            sections.setdefault(section, {}).update(values)
+        return sections
+
+    def render(self) -> str:
+        """Returns the dcv-connection-gateway.conf TOML document."""
+        lines = []
+        for section, values in self.sections().items():
+            if lines:
+                lines.append("")
+            lines.append(f"[{section}]")
+            for key, value in values.items():
+                if (section, key) in COMMENTS:
+                    lines.append(f"# {COMMENTS[section, key]}")
+                lines.append(f"{key} = {to_toml(value)}")
+        return "\n".join(lines)
+
+    def sysctls(self) -> Dict[str, int]:
+        """Kernel settings the gateway needs, UDP buffers for QUIC foremost."""
+        if self.socket_buffer_bytes is None:
+            return {}
+        return {
+            f"net.core.{name}": self.socket_buffer_bytes
+            for name in ("rmem_max", "wmem_max", "rmem_default", "wmem_default")
+        }
+
+
+def to_toml(value: Any) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return str(value)
+    if isinstance(value, str):
+        return json.dumps(value)
+    if isinstance(value, list):
+        return "[" + ", ".join(to_toml(item) for item in value) + "]"
+    raise TypeError(f"Unsupported gateway configuration value {value!r}")
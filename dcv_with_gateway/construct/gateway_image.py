@@ -0,0 +1,148 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import hashlib
+import json
+from string import Template
+from aws_cdk import (
+    Names,
+    Resource,
+    Stack,
+    aws_ec2 as ec2,
+    aws_iam as iam,
+    aws_imagebuilder as imagebuilder,
+)
+from constructs import Construct
+from cdk_nag import NagSuppressions
+
+# Image Builder managed Amazon Linux 2 images, by architecture
+PARENT_IMAGES = {
+    ec2.InstanceArchitecture.ARM_64: "amazon-linux-2-arm64",
+    ec2.InstanceArchitecture.X86_64: "amazon-linux-2-x86",
+}
+
+
+class GatewayImage(Resource):
+    """Gateway AMI with scripts/gateway/install.linux.sh already run.
+
+    The image is built by Image Builder while the stack deploys, and rebuilt
+    whenever the install script changes. Gateways booting from it only run
+    scripts/gateway/user_data.linux.sh.
+    """
+
+    def __init__(
+        self,
+        scope: Construct,
+        construct_id: str,
+        vpc: ec2.IVpc,
+        instance_type: ec2.InstanceType,
+        **kwargs,
+    ) -> None:
+        super().__init__(scope, construct_id, **kwargs)
+        stack = Stack.of(self)
+
+        with open("scripts/gateway/install.linux.sh", "r") as f:
+            # the sidecar runtime is baked in whether the sidecar is on or not
+            install = Template(f.read()).safe_substitute(RESOLVER_SIDECAR="true")
+        version = hashlib.sha256(install.encode()).hexdigest()[:8]
+
+        component = imagebuilder.CfnComponent(
+            self,
+            "Component",
+            name=f"{Names.unique_id(self)}-install-{version}",
+            platform="Linux",
+            version="1.0.0",
+            description="Installs the DCV Connection Gateway and its host agents",
+            data=json.dumps(
+                {
+                    "name": "dcv-connection-gateway",
+                    "schemaVersion": 1.0,
+                    "phases": [
+                        {
+                            "name": "build",
+                            "steps": [
+                                {
+                                    "name": "Install",
+                                    "action": "ExecuteBash",
+                                    "inputs": {"commands": [install]},
+                                }
+                            ],
+                        }
+                    ],
+                }
+            ),
+        )
+
+        recipe = imagebuilder.CfnImageRecipe(
+            self,
+            "Recipe",
+            name=f"{Names.unique_id(self)}-{version}",
+            version="1.0.0",
+            parent_image=stack.format_arn(
+                service="imagebuilder",
+                account="aws",
+                resource="image",
+                resource_name=f"{PARENT_IMAGES[instance_type.architecture]}/x.x.x",
+            ),
+            components=[
+                imagebuilder.CfnImageRecipe.ComponentConfigurationProperty(
+                    component_arn=component.attr_arn
+                )
+            ],
+        )
+
+        role = iam.Role(
+            self,
+            "BuildRole",
+            assumed_by=iam.ServicePrincipal("ec2.amazonaws.com"),
+            managed_policies=[
+                iam.ManagedPolicy.from_aws_managed_policy_name(
+                    "AmazonSSMManagedInstanceCore"
+                ),
+                iam.ManagedPolicy.from_aws_managed_policy_name(
+                    "EC2InstanceProfileForImageBuilder"
+                ),
+            ],
+        )
+        instance_profile = iam.InstanceProfile(self, "BuildInstanceProfile", role=role)
+        security_group = ec2.SecurityGroup(
+            self,
+            "BuildSecurityGroup",
+            vpc=vpc,
+            description="DCV Gateway image build Security Group",
+        )
+
+        infrastructure = imagebuilder.CfnInfrastructureConfiguration(
+            self,
+            "Infrastructure",
+            name=Names.unique_id(self),
+            instance_profile_name=instance_profile.instance_profile_name,
+            instance_types=[instance_type.to_string()],
+            subnet_id=vpc.select_subnets(
+                subnet_type=ec2.SubnetType.PRIVATE_WITH_EGRESS
+            ).subnet_ids[0],
+            security_group_ids=[security_group.security_group_id],
+            terminate_instance_on_failure=True,
+        )
+
+        image = imagebuilder.CfnImage(
+            self,
+            "Image",
+            image_recipe_arn=recipe.attr_arn,
+            infrastructure_configuration_arn=infrastructure.attr_arn,
+        )
+
+        self.machine_image = ec2.MachineImage.generic_linux(
+            {stack.region: image.attr_image_id}
+        )
+
+        # CDK supressions
+        NagSuppressions.add_resource_suppressions(
+            role,
+            [
+                {
+                    "id": "AwsSolutions-IAM4",
+                    "reason": "Image Builder build instances require its managed instance profile policy",
+                }
+            ],
+        )
@@ -11,8 +11,16 @@ from aws_cdk import (
 )
 from cdk_nag import NagSuppressions
 
+from dcv_with_gateway.construct.fleet import fleet_instance_types, fleet_launch
 from dcv_with_gateway.construct.server import Server
 
+PREFIX = "server:linux-"
+# architecture names of the DCV AMIs
+AMI_ARCHITECTURES = {
+    ec2.InstanceArchitecture.ARM_64: "aarch64",
+    ec2.InstanceArchitecture.X86_64: "x86_64",
+}
+
 
 class ServerLinux(Server):
     def __init__(
@@ -32,8 +40,11 @@ class ServerLinux(Server):
             **kwargs,
         )
 
+        instance_types = fleet_instance_types(self.node, PREFIX, "c7g.large")
         ami = ec2.MachineImage.lookup(
-            name="DCV-AmazonLinux2-aarch64-*", owners=["amazon"], windows=False
+            name=f"DCV-AmazonLinux2-{AMI_ARCHITECTURES[instance_types[0].architecture]}-*",
+            owners=["amazon"],
+            windows=False,
         )
 
         with open("scripts/server/user_data.linux.sh", "r") as f:
@@ -48,9 +59,7 @@ class ServerLinux(Server):
             machine_image=ami,
             user_data=ec2.UserData.custom(user_data),
             role=self.server_iam_role,
-            instance_type=ec2.InstanceType.of(
-                ec2.InstanceClass.C7G, ec2.InstanceSize.LARGE
-            ),
+            instance_type=instance_types[0],
             associate_public_ip_address=False,
             launch_template_name=f"{self.node.path}/server",
             require_imdsv2=True,
@@ -63,13 +72,15 @@ class ServerLinux(Server):
             vpc_subnets=ec2.SubnetSelection(
                 subnet_type=ec2.SubnetType.PRIVATE_WITH_EGRESS
             ),
-            min_capacity=1,
-            max_capacity=1,
-            launch_template=self.launch_template,
+            min_capacity=int(self.node.try_get_context(f"{PREFIX}min-capacity") or 1),
+            max_capacity=int(self.node.try_get_context(f"{PREFIX}max-capacity") or 1),
+            **fleet_launch(self.node, PREFIX, self.launch_template, instance_types),
             health_check=autoscaling.HealthCheck.ec2(grace=Duration.minutes(1)),
         )
         Tags.of(self.asg).add("dcv:type", "server")
-        Tags.of(self.asg).add("dcv:user", "dcv")
+        Tags.of(self.asg).add(
+            "dcv:user", self.node.try_get_context(f"{PREFIX}user") or "dcv"
+        )
 
         # CDK Nag suppressions
         NagSuppressions.add_resource_suppressions(
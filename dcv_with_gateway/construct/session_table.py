@@ -0,0 +1,53 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""Access to the session table for readers that only resolve sessions."""
+
+from aws_cdk import (
+    aws_dynamodb as dynamodb,
+    aws_iam as iam,
+)
+
+# attributes resolving a session reads, RESOLVE_ATTRIBUTES of dcv_common.sessions
+# (kept equal by tests/gateway; dcv_common needs boto3, which synth does not)
+SESSION_RESOLVE_ATTRIBUTES = [
+    "session_id",
+    "instance_id",
+    "instance_ip",
+    "expire_at",
+    "client_ip",
+    "transports",
+    "tcp_port",
+    "udp_port",
+]
+
+
+def grant_resolve(table: dynamodb.ITable, grantee: iam.IGrantable) -> None:
+    """Lets the grantee read what resolving needs and bind clients.
+
+    Session secrets and stored auth tokens can never be read.
+    """
+    grantee.grant_principal.add_to_principal_policy(
+        iam.PolicyStatement(
+            actions=["dynamodb:GetItem"],
+            resources=[table.table_arn],
+            conditions={
+                "ForAllValues:StringEquals": {
+                    "dynamodb:Attributes": SESSION_RESOLVE_ATTRIBUTES
+                },
+                "StringEquals": {"dynamodb:Select": "SPECIFIC_ATTRIBUTES"},
+            },
+        )
+    )
+    grantee.grant_principal.add_to_principal_policy(
+        iam.PolicyStatement(
+            actions=["dynamodb:UpdateItem"],
+            resources=[table.table_arn],
+            conditions={
+                "ForAllValues:StringEquals": {
+                    "dynamodb:Attributes": ["session_id", "client_ip"]
+                },
+                "StringEqualsIfExists": {"dynamodb:ReturnValues": "NONE"},
+            },
+        )
+    )
@@ -36,7 +36,9 @@ class DcvWithGatewayStack(Stack):
             self,
             "Gateway",
             vpc=network_stack.vpc,
-            resolver_url=access_management.url,
+            resolver_url=access_management.resolver_url,
+            session_table=access_management.database,
+            resolver_environment=access_management.resolver_environment,
         )
         allowed_ip_cidr = self.node.get_context("gateway:allowed-ip-cidr")
         if allowed_ip_cidr:
@@ -56,12 +58,12 @@ class DcvWithGatewayStack(Stack):
             "WindowsServer",
             vpc=network_stack.vpc,
             gateway_security_group_id=gateway.gateway_security_group.security_group_id,
-            authenticator_url=f"{access_management.url}/authenticate",
+            authenticator_url=access_management.authenticator_url,
         )
         ServerLinux(
             self,
             "LinuxServer",
             vpc=network_stack.vpc,
             gateway_security_group_id=gateway.gateway_security_group.security_group_id,
-            authenticator_url=f"{access_management.url}/authenticate",
+            authenticator_url=access_management.authenticator_url,
         )
@@ -0,0 +1,98 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""Adds sessions activated before the active session indexes existed to them.
+
+The authenticator copies instance_id and username into active_instance_id and
+active_username when it activates a session, and sets ttl to the end of the
+active session lifetime. Sessions activated by earlier versions lack some of
+these attributes: without the active_* copies they are missing from
+GET /sessions, without ttl they stay listed and TTL never deletes them. This
+script scans the session table once and sets the attributes on such
+sessions, with ttl counted from their activation.
+
+    python scripts/backfill_active_sessions.py --table-name <table> [--dry-run]
+"""
+
+import argparse
+
+import boto3
+from botocore.exceptions import ClientError
+
+
+def backfill(dynamodb, table_name, active_session_lifetime, dry_run=False):
+    """Returns the number of sessions found and updated."""
+    found = updated = 0
+    paginator = dynamodb.get_paginator("scan")
+    for page in paginator.paginate(
+        TableName=table_name,
+        FilterExpression="#activated_at > :zero AND ("
+        "attribute_not_exists(#active_instance_id) OR attribute_not_exists(#ttl))",
+        ProjectionExpression="#session_id, #activated_at",
+        ExpressionAttributeNames={
+            "#session_id": "session_id",
+            "#activated_at": "activated_at",
+            "#active_instance_id": "active_instance_id",
+            "#ttl": "ttl",
+        },
+        ExpressionAttributeValues={":zero": {"N": "0"}},
+    ):
+        for item in page["Items"]:
+            found += 1
+            if dry_run:
+                continue
+            ttl = int(item["activated_at"]["N"]) + active_session_lifetime
+            try:
+                # the condition skips sessions revoked since the scan
+                dynamodb.update_item(
+                    TableName=table_name,
+                    Key={"session_id": item["session_id"]},
+                    UpdateExpression="SET #active_instance_id = #instance_id,"
+                    " #active_username = #username,"
+                    " #ttl = if_not_exists(#ttl, :ttl)",
+                    ConditionExpression="attribute_exists(#session_id)",
+                    ExpressionAttributeNames={
+                        "#session_id": "session_id",
+                        "#instance_id": "instance_id",
+                        "#username": "username",
+                        "#active_instance_id": "active_instance_id",
+                        "#active_username": "active_username",
+                        "#ttl": "ttl",
+                    },
+                    ExpressionAttributeValues={":ttl": {"N": str(ttl)}},
+                )
+            except ClientError as e:
+                if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                    raise
+                continue
+            updated += 1
+    return found, updated
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--table-name", required=True, help="session table name")
+    parser.add_argument(
+        "--active-session-lifetime",
+        type=int,
+        default=86400,
+        help="gateway:active-session-lifetime of the stack, in seconds",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="count the sessions to update without updating them",
+    )
+    args = parser.parse_args()
+
+    found, updated = backfill(
+        boto3.client("dynamodb"),
+        args.table_name,
+        args.active_session_lifetime,
+        args.dry_run,
+    )
+    print(f"{found} activated sessions to backfill, {updated} updated")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+#!/bin/bash
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy of this
+# software and associated documentation files (the "Software"), to deal in the Software
+# without restriction, including without limitation the rights to use, copy, modify,
+# merge, publish, distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR IMPLIED,
+# INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY, FITNESS FOR A
+# PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT
+# HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
+# SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+
+# NICE DCV Connection Gateway Installer Script
+#
+# Installs the gateway, the web viewer and the host agents. Runs at boot
+# ahead of user_data.linux.sh, or once when the gateway image is baked.
+
+set -eE
+
+# Retrieve System Info
+read -r system version <<<$(echo $(cat /etc/os-release | grep "^ID=\|^VERSION_ID=" | sort | cut -d"=" -f2 | tr -d "\"" | tr '[:upper:]' '[:lower:]'))
+major_version="${version%.*}"
+arch="$(arch)"
+CLOUDFRONT_PREFIX="https://d1uj6qtbmh3dt5.cloudfront.net"
+TMP_DIR="$(mktemp -d /tmp/XXXXXX)"
+trap 'rm -rf -- "$TMP_DIR"' ERR
+
+case $system in
+    amzn )
+        if [ "$major_version" = 2 ]; then
+            package_type="el7"
+            package_manager="yum"
+            package_extension="rpm"
+        fi
+        ;;
+    centos|rhel )
+        if [[ "$major_version" =~ ^(7|8|9) ]]; then
+            package_type="el$major_version"
+            if [[ "$major_version" =~ ^(8|9) ]]; then
+              package_manager="dnf"
+            else
+              package_manager="yum"
+            fi
+            package_extension="rpm"
+        fi
+        ;;
+    ubuntu )
+        if [ "$major_version" = 22 ] || [ "$major_version" = 20 ]; then
+            package_type="ubuntu$(echo $version | tr -d '.')"
+            package_manager="apt"
+            package_extension="deb"
+        fi
+        ;;
+    * )
+        echo "Error: system '$system' is not supported"
+        exit 1
+        ;;
+esac
+
+if [ -z "$package_type" ]; then
+    echo "Error: system '$system' with version '$version' is not supported for arch '$arch'"
+    exit 1
+fi
+
+# Download Packages
+if [ "$package_manager" = apt ]; then
+    curl -o "$TMP_DIR/NICE-GPG-KEY" "$CLOUDFRONT_PREFIX/NICE-GPG-KEY"
+    gpg --import "$TMP_DIR/NICE-GPG-KEY"
+    if [ $arch != "x86_64" ]; then
+        deb_arch="arm64"
+        curl -o "$TMP_DIR/nice-dcv-server.tgz" "$CLOUDFRONT_PREFIX/nice-dcv-ubuntu2204-aarch64.tgz"
+    else
+        deb_arch="amd64"
+        curl -o "$TMP_DIR/nice-dcv-server.tgz" "$CLOUDFRONT_PREFIX/nice-dcv-$package_type-$arch.tgz"
+    fi
+    curl -o "$TMP_DIR/nice-dcv-connection-gateway.$package_extension" "$CLOUDFRONT_PREFIX/nice-dcv-connection-gateway_$deb_arch.$package_type.$package_extension"
+else
+    rpm --import "$CLOUDFRONT_PREFIX"/NICE-GPG-KEY
+    curl -o "$TMP_DIR/nice-dcv-connection-gateway.$package_extension" "$CLOUDFRONT_PREFIX/nice-dcv-connection-gateway-$package_type.$arch.$package_extension"
+    curl -o "$TMP_DIR/nice-dcv-server.tgz" "$CLOUDFRONT_PREFIX/nice-dcv-$package_type-$arch.tgz"
+fi
+
+# Install Packages
+tar -xvzf "$TMP_DIR/nice-dcv-server.tgz" -C "$TMP_DIR"
+for package_pattern in "nice-dcv-web-viewer*" "nice-dcv-connection-gateway.$package_extension"; do
+    package_full_path=$(find "$TMP_DIR" -name "$package_pattern")
+    "$package_manager" install -y "$package_full_path"
+done
+
+# Install Resolver Sidecar Runtime
+if [ "$RESOLVER_SIDECAR" = true ]; then
+    if [ "$system" = amzn ]; then
+        amazon-linux-extras install -y python3.8
+        python_bin="$(command -v python3.8)"
+    else
+        "$package_manager" install -y python3 python3-pip
+        python_bin="$(command -v python3)"
+    fi
+    "$python_bin" -m pip install boto3
+fi
+
+# Install Drain Agent
+if [ "$package_manager" = apt ]; then
+    apt install -y conntrack
+else
+    "$package_manager" install -y conntrack-tools
+fi
+
+cat > /usr/local/bin/dcv-gateway-drain << 'EOL'
+#!/bin/bash
+# Drains the gateway once its Auto Scaling group terminates it: refuses new
+# connections, waits for open ones to close, then lets the termination go on.
+
+imds() {
+    local token
+    token="$(curl -sf -X PUT http://169.254.169.254/latest/api/token -H "X-aws-ec2-metadata-token-ttl-seconds: 300")"
+    curl -sf -H "X-aws-ec2-metadata-token: $token" "http://169.254.169.254/latest/meta-data/$1"
+}
+
+connections() {
+    local tcp udp
+    tcp="$(ss -Htn state established '( sport = :8443 )' | wc -l)"
+    udp="$(conntrack -L -p udp --orig-port-dst 8443 2>/dev/null | wc -l)"
+    echo $((tcp + udp))
+}
+
+until [ "$(imds autoscaling/target-lifecycle-state)" = Terminated ]; do
+    sleep 5
+done
+
+# fail the NLB health check and refuse new connections, open ones go on
+iptables -I INPUT -p tcp --dport 8989 -j REJECT
+for protocol in tcp udp; do
+    iptables -I INPUT -p "$protocol" --dport 8443 -m conntrack --ctstate NEW -j REJECT
+done
+
+deadline=$((SECONDS + drain_timeout))
+while [ "$(connections)" -gt "$connection_threshold" ] && [ "$SECONDS" -lt "$deadline" ]; do
+    sleep 10
+done
+
+instance_id="$(imds instance-id)"
+region="$(imds placement/region)"
+group_name="$(aws autoscaling describe-auto-scaling-instances --region "$region" \
+    --instance-ids "$instance_id" \
+    --query "AutoScalingInstances[0].AutoScalingGroupName" --output text)"
+aws autoscaling complete-lifecycle-action --region "$region" \
+    --auto-scaling-group-name "$group_name" \
+    --lifecycle-hook-name "$hook_name" \
+    --instance-id "$instance_id" \
+    --lifecycle-action-result CONTINUE
+EOL
+chmod +x /usr/local/bin/dcv-gateway-drain
+
+# Clean Up
+rm -rf "$TMP_DIR"
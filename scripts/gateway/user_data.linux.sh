@@ -14,107 +14,104 @@
 # OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE
 # SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
 
-# NICE DCV Connection Gateway Installer Script
+# NICE DCV Connection Gateway Configuration Script
+#
+# Configures and starts the gateway installed by install.linux.sh.
 
 set -eE
 
-# Retrieve System Info
-read -r system version <<<$(echo $(cat /etc/os-release | grep "^ID=\|^VERSION_ID=" | sort | cut -d"=" -f2 | tr -d "\"" | tr '[:upper:]' '[:lower:]'))
-major_version="${version%.*}"
-arch="$(arch)"
-CLOUDFRONT_PREFIX="https://d1uj6qtbmh3dt5.cloudfront.net"
 TMP_DIR="$(mktemp -d /tmp/XXXXXX)"
 trap 'rm -rf -- "$TMP_DIR"' ERR
 
-case $system in
-    amzn )
-        if [ "$major_version" = 2 ]; then
-            package_type="el7"
-            package_manager="yum"
-            package_extension="rpm"
-        fi
-        ;;
-    centos|rhel )
-        if [[ "$major_version" =~ ^(7|8|9) ]]; then
-            package_type="el$major_version"
-            if [[ "$major_version" =~ ^(8|9) ]]; then
-              package_manager="dnf"
-            else
-              package_manager="yum"
-            fi
-            package_extension="rpm"
-        fi
-        ;;
-    ubuntu )
-        if [ "$major_version" = 22 ] || [ "$major_version" = 20 ]; then
-            package_type="ubuntu$(echo $version | tr -d '.')"
-            package_manager="apt"
-            package_extension="deb"
-        fi
-        ;;
-    * )
-        echo "Error: system '$system' is not supported"
-        exit 1
-        ;;
-esac
-
-if [ -z "$package_type" ]; then
-    echo "Error: system '$system' with version '$version' is not supported for arch '$arch'"
-    exit 1
-fi
+# Configure Resolver Sidecar
+if [ "$RESOLVER_SIDECAR" = true ]; then
+    python_bin="$(command -v python3.8 || command -v python3)"
 
-# Download Packages
-if [ "$package_manager" = apt ]; then
-    curl -o "$TMP_DIR/NICE-GPG-KEY" "$CLOUDFRONT_PREFIX/NICE-GPG-KEY"
-    gpg --import "$TMP_DIR/NICE-GPG-KEY"
-    if [ $arch != "x86_64" ]; then
-        deb_arch="arm64"
-        curl -o "$TMP_DIR/nice-dcv-server.tgz" "$CLOUDFRONT_PREFIX/nice-dcv-ubuntu2204-aarch64.tgz"
-    else
-        deb_arch="amd64"
-        curl -o "$TMP_DIR/nice-dcv-server.tgz" "$CLOUDFRONT_PREFIX/nice-dcv-$package_type-$arch.tgz"
-    fi
-    curl -o "$TMP_DIR/nice-dcv-connection-gateway.$package_extension" "$CLOUDFRONT_PREFIX/nice-dcv-connection-gateway_$deb_arch.$package_type.$package_extension"
-else
-    rpm --import "$CLOUDFRONT_PREFIX"/NICE-GPG-KEY
-    curl -o "$TMP_DIR/nice-dcv-connection-gateway.$package_extension" "$CLOUDFRONT_PREFIX/nice-dcv-connection-gateway-$package_type.$arch.$package_extension"
-    curl -o "$TMP_DIR/nice-dcv-server.tgz" "$CLOUDFRONT_PREFIX/nice-dcv-$package_type-$arch.tgz"
+    aws s3 cp "$RESOLVER_SIDECAR_ASSET_URL" "$TMP_DIR/dcv-resolver.zip"
+    mkdir -p /opt/dcv-resolver
+    unzip -o "$TMP_DIR/dcv-resolver.zip" -d /opt/dcv-resolver
+
+    cat > /etc/dcv-resolver.env << EOL
+$RESOLVER_SIDECAR_ENVIRONMENT
+EOL
+    cat > /etc/systemd/system/dcv-resolver.service << EOL
+[Unit]
+Description=DCV session resolver sidecar
+Wants=network-online.target
+After=network-online.target
+Before=dcv-connection-gateway.service
+
+[Service]
+User=nobody
+EnvironmentFile=/etc/dcv-resolver.env
+ExecStart=$python_bin /opt/dcv-resolver/resolver_sidecar/server.py
+Restart=always
+
+[Install]
+WantedBy=multi-user.target
+EOL
+    systemctl daemon-reload
+    systemctl enable dcv-resolver
+    systemctl start dcv-resolver
 fi
 
-# Install Packages
-tar -xvzf "$TMP_DIR/nice-dcv-server.tgz" -C "$TMP_DIR"
-for package_pattern in "nice-dcv-web-viewer*" "nice-dcv-connection-gateway.$package_extension"; do
-    package_full_path=$(find "$TMP_DIR" -name "$package_pattern")
-    "$package_manager" install -y "$package_full_path"
-done
+# Tune Kernel
+cat > /etc/sysctl.d/90-dcv-connection-gateway.conf << 'EOL'
+$GATEWAY_SYSCTLS
+EOL
+sysctl --system
 
 # Configure Gateway
-cat > /etc/dcv-connection-gateway/dcv-connection-gateway.conf << EOL
-[gateway]
-quic-listen-endpoints = ["0.0.0.0", "::"]
-quic-port = 8443
-web-listen-endpoints = ["0.0.0.0", "::"]
-web-port = 8443
-
-[health-check]
-# note this is TCP and not HTTP endpoint
-bind-addr = "0.0.0.0"
-port = 8989
-
-[dcv]
-# @TODO for production deployments use private certificate registry
-tls-strict = false
-
-[resolver]
-url = "$RESOLVER_URL"
-
-[web-resources]
-local-resources-path = "/usr/share/dcv/www"
+cat > /etc/dcv-connection-gateway/dcv-connection-gateway.conf << 'EOL'
+$GATEWAY_CONFIG
 EOL
 
 # Enable and start Gateway
 systemctl enable dcv-connection-gateway
 systemctl start dcv-connection-gateway
 
+# Configure Drain Agent
+cat > /etc/dcv-gateway-drain.env << EOL
+hook_name=$DRAIN_HOOK_NAME
+drain_timeout=$DRAIN_TIMEOUT
+connection_threshold=$DRAIN_CONNECTION_THRESHOLD
+EOL
+cat > /etc/systemd/system/dcv-gateway-drain.service << EOL
+[Unit]
+Description=DCV gateway connection drain agent
+Wants=network-online.target
+After=network-online.target
+
+[Service]
+EnvironmentFile=/etc/dcv-gateway-drain.env
+ExecStart=/usr/local/bin/dcv-gateway-drain
+Restart=on-failure
+
+[Install]
+WantedBy=multi-user.target
+EOL
+systemctl daemon-reload
+systemctl enable dcv-gateway-drain
+systemctl start dcv-gateway-drain
+
+# Report Boot Time
+# seconds from boot until the gateway answers health checks
+if [ "$BOOT_METRIC" = true ]; then
+    for _ in $(seq 600); do
+        if ss -Htln '( sport = :8989 )' | grep -q .; then
+            imds_token="$(curl -sf -X PUT http://169.254.169.254/latest/api/token -H "X-aws-ec2-metadata-token-ttl-seconds: 60")"
+            region="$(curl -sf -H "X-aws-ec2-metadata-token: $imds_token" http://169.254.169.254/latest/meta-data/placement/region)"
+            aws cloudwatch put-metric-data --region "$region" \
+                --namespace DcvWithGateway \
+                --metric-name BootToHealthy \
+                --unit Seconds \
+                --value "$(cut -d ' ' -f 1 /proc/uptime)" \
+                --dimensions "Function=gateway,Image=$GATEWAY_IMAGE" || true
+            break
+        fi
+        sleep 1
+    done
+fi
+
 # Clean Up
 rm -rf "$TMP_DIR"
@@ -1,158 +1,182 @@
 # Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 # SPDX-License-Identifier: MIT-0
 
-import json
-import os
-import boto3
 import time
-import base64
 from urllib import parse
 
 from botocore.exceptions import ClientError
-from typing import Optional
-from pydantic import BaseModel, Field
-from xmltodict import unparse
-
-ec2 = boto3.client("ec2")
-dynamodb = boto3.client("dynamodb")
-kms = boto3.client("kms")
-
-TABLE_NAME = os.environ.get("DCV_TABLE_NAME")
-KMS_KEY = os.environ.get("DCV_KMS_KEY")
-
-
-class Auth(BaseModel):
-    class Config:
-        populate_by_name = True
-
-    result: Optional[str] = Field(None, alias="_result", title="Result")
-    username: Optional[str] = Field(None, title="Username")
-    message: Optional[str] = Field(None, title="Error message")
-
-
-class AuthenticateResponse(BaseModel):
-    class Config:
-        populate_by_name = True
-
-    auth: Auth
-
-    def to_xml(self):
-        return unparse(self.model_dump(by_alias=True), attr_prefix="_")
-
-
-def get_instance_ip(instance_id):
-    response = ec2.describe_instances(InstanceIds=[instance_id])
-    private_ip_addr = response["Reservations"][0]["Instances"][0]["PrivateIpAddress"]
-    return private_ip_addr
-
-
+from xml.sax.saxutils import escape, quoteattr
+
+from dcv_common import clients, metrics
+from dcv_common.config import TABLE_NAME, env_bool, env_int
+from dcv_common.events import get_body, get_source_ip
+from dcv_common.instances import get_instance_ip
+from dcv_common.tokens import open_auth_token
+
+REFRESH_INSTANCE_IP = env_bool("DCV_REFRESH_INSTANCE_IP")
+ACTIVE_SESSION_LIFETIME = env_int("ACTIVE_SESSION_LIFETIME", 86400)
+
+clients.warmup("dynamodb", "kms")
+
+
+# Same document xmltodict.unparse() produced for the former pydantic response
+# models, rendered without importing either library on the cold start path.
+AUTH_RESPONSE_TEMPLATE = (
+    '<?xml version="1.0" encoding="utf-8"?>\n'
+    "<auth result={result}>"
+    "<username>{username}</username>"
+    "<message>{message}</message>"
+    "</auth>"
+)
+
+
+def render_auth_response(result, username=None, message=None):
+    if result == "no":
+        metrics.reject(message)
+    return AUTH_RESPONSE_TEMPLATE.format(
+        result=quoteattr(result),
+        username=escape(username or ""),
+        message=escape(message or ""),
+    )
+
+
+def is_instance_ip(item, source_ip):
+    instance_ip = item.get("instance_ip", {}).get("S")
+    if source_ip is None:
+        # without a caller IP only older sessions, which stored no IP to
+        # check against, are accepted
+        return instance_ip is None
+    if instance_ip == source_ip:
+        return True
+    # no stored IP on older sessions; with refresh enabled a mismatch is
+    # re-checked against EC2 in case the instance was replaced
+    if instance_ip is None or REFRESH_INSTANCE_IP:
+        return source_ip == get_instance_ip(item["instance_id"]["S"])
+    return False
+
+
+def activate_session(session_id, secret, now, source_ip=None, check_origin=True):
+    """Validates and activates a session in a single conditional write.
+
+    With check_origin, the stored instance IP must be the source IP; a
+    missing source IP only matches sessions that stored no instance IP.
+    Returns the activated item. When the condition fails, the raised
+    ConditionalCheckFailedException carries the current item, if any.
+    """
+    condition = (
+        "attribute_exists(#session_id) AND #expire_at >= :now"
+        " AND #activated_at = :zero AND #secret = :secret"
+    )
+    names = {
+        "#session_id": "session_id",
+        "#expire_at": "expire_at",
+        "#activated_at": "activated_at",
+        "#secret": "secret",
+        "#instance_id": "instance_id",
+        "#username": "username",
+        "#active_instance_id": "active_instance_id",
+        "#active_username": "active_username",
+        "#ttl": "ttl",
+    }
+    values = {
+        ":now": {"N": str(now)},
+        ":ttl": {"N": str(now + ACTIVE_SESSION_LIFETIME)},
+        ":zero": {"N": "0"},
+        ":secret": {"S": secret},
+    }
+    if check_origin and source_ip is None:
+        condition += " AND attribute_not_exists(#instance_ip)"
+        names["#instance_ip"] = "instance_ip"
+    elif check_origin:
+        condition += " AND #instance_ip = :source_ip"
+        names["#instance_ip"] = "instance_ip"
+        values[":source_ip"] = {"S": source_ip}
+
+    response = clients.dynamodb.update_item(
+        TableName=TABLE_NAME,
+        Key={"session_id": {"S": session_id}},
+        # the active_* copies are the keys of the sparse active session
+        # indexes, so only activated sessions are listed there; the TTL is
+        # pushed out so TTL does not delete the session while it is in use
+        UpdateExpression=(
+            "SET #activated_at = :now, #active_instance_id = #instance_id,"
+            " #active_username = #username, #ttl = :ttl"
+        ),
+        ConditionExpression=condition,
+        ExpressionAttributeNames=names,
+        ExpressionAttributeValues=values,
+        ReturnValues="ALL_NEW",
+        ReturnValuesOnConditionCheckFailure="ALL_OLD",
+    )
+    return response["Attributes"]
+
+
+def check_session(item, secret, source_ip, now):
+    """Returns (status code, message) for the first check the item fails, or None."""
+    if item is None:
+        return 404, "Session not found"
+    if int(item["expire_at"]["N"]) < now:
+        return 400, "Expired session"
+    if int(item["activated_at"]["N"]) > 0:
+        return 400, "Session already activated"
+    if not is_instance_ip(item, source_ip):
+        return 400, "Unknown origin"
+    if secret != item["secret"]["S"]:
+        return 400, "Invalid secret"
+    return None
+
+
+@metrics.handler("authenticator")
 def handler(event, context):
-    params = dict(parse.parse_qsl(event["body"], strict_parsing=True))
+    params = dict(parse.parse_qsl(get_body(event), strict_parsing=True))
 
     authToken = params.get("authenticationToken")
-    source_ip = event.get("requestContext").get("identity").get("sourceIp")
+    source_ip = get_source_ip(event)
 
     if authToken == None:
         return {
             "statusCode": 400,
-            "body": AuthenticateResponse(
-                auth=Auth(result="no", message="Invalid format")
-            ).to_xml(),
+            "body": render_auth_response("no", message="Invalid format"),
         }
 
     try:
-        token_bytes = base64.urlsafe_b64decode(authToken)
-        token_string = kms.decrypt(KeyId=KMS_KEY, CiphertextBlob=token_bytes)[
-            "Plaintext"
-        ].decode()
-        token_payload = json.loads(token_string)
+        token_payload = open_auth_token(authToken)
     except ClientError as e:
         return {
             "statusCode": 400,
-            "body": AuthenticateResponse(
-                auth=Auth(result="no", message="Invalid token format")
-            ).to_xml(),
+            "body": render_auth_response("no", message="Invalid token format"),
         }
     except Exception as e:
         return {
             "statusCode": 400,
-            "body": AuthenticateResponse(
-                auth=Auth(result="no", message="Invalid token format")
-            ).to_xml(),
+            "body": render_auth_response("no", message="Invalid token format"),
         }
 
     session_id = token_payload["session_id"]
     secret = token_payload["secret"]
+    now = int(time.time())
     try:
-        item = dynamodb.get_item(
-            TableName=TABLE_NAME, Key={"session_id": {"S": session_id}}
-        )
-        if not "Item" in item:
-            return {
-                "statusCode": 404,
-                "body": AuthenticateResponse(
-                    auth=Auth(result="no", message="Session not found")
-                ).to_xml(),
-            }
-
-        expire_at = int(item["Item"]["expire_at"]["N"])
-        if expire_at < int(time.time()):
-            return {
-                "statusCode": 400,
-                "body": AuthenticateResponse(
-                    auth=Auth(result="no", message="Expired session")
-                ).to_xml(),
-            }
-
-        activated_at = int(item["Item"]["activated_at"]["N"])
-        if activated_at > 0:
-            return {
-                "statusCode": 400,
-                "body": AuthenticateResponse(
-                    auth=Auth(result="no", message="Session already activated")
-                ).to_xml(),
-            }
-
-        if source_ip != get_instance_ip(item["Item"]["instance_id"]["S"]):
-            return {
-                "statusCode": 400,
-                "body": AuthenticateResponse(
-                    auth=Auth(result="no", message="Unknown origin")
-                ).to_xml(),
-            }
-
-        if secret != item["Item"]["secret"]["S"]:
-            return {
-                "statusCode": 400,
-                "body": AuthenticateResponse(
-                    auth=Auth(result="no", message="Invalid secret")
-                ).to_xml(),
-            }
-
-        username = item["Item"]["username"]["S"]
-
-        dynamodb.update_item(
-            TableName=TABLE_NAME,
-            Key={"session_id": {"S": session_id}},
-            UpdateExpression="SET #attr = :val",
-            ConditionExpression="#attr = :zero",
-            ExpressionAttributeNames={"#attr": "activated_at"},
-            ExpressionAttributeValues={
-                ":val": {"N": str(int(time.time()))},
-                ":zero": {"N": "0"},
-            },
-        )
+        try:
+            item = activate_session(session_id, secret, now, source_ip)
+        except ClientError as e:
+            if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+                raise
+            rejection = check_session(e.response.get("Item"), secret, source_ip, now)
+            if rejection is not None:
+                status_code, message = rejection
+                return {
+                    "statusCode": status_code,
+                    "body": render_auth_response("no", message=message),
+                }
+            # the origin was confirmed through EC2 instead of the stored IP
+            item = activate_session(session_id, secret, now, check_origin=False)
     except ClientError as e:
         return {
             "statusCode": 400,
-            "body": AuthenticateResponse(
-                auth=Auth(result="no", message="Unknown error")
-            ).to_xml(),
+            "body": render_auth_response("no", message="Unknown error"),
         }
 
     return {
         "statusCode": 200,
-        "body": AuthenticateResponse(
-            auth=Auth(result="yes", username=username)
-        ).to_xml(),
+        "body": render_auth_response("yes", username=item["username"]["S"]),
     }
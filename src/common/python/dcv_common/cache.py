@@ -0,0 +1,45 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import threading
+import time
+from collections import OrderedDict
+
+# returned by TTLCache.get() on a miss, as None is a valid cached value
+MISSING = object()
+
+
+class TTLCache:
+    """In-process TTL/LRU cache, kept across warm invocations of a container.
+
+    Entries expire at an absolute epoch time so that callers can bound them by
+    data that carries its own expiry, e.g. a session's ``expire_at``. Safe to
+    share between threads.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.time():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+            self.misses += 1
+            return MISSING
+
+    def put(self, key, value, expires_at):
+        if expires_at <= time.time():
+            return
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
@@ -0,0 +1,66 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""boto3 clients shared by the handlers.
+
+Clients are created on first use and then kept for the lifetime of the
+container, so a handler only pays for the service models it actually needs:
+
+    from dcv_common import clients
+
+    clients.dynamodb.get_item(...)
+"""
+
+import os
+import socket
+import threading
+from urllib.parse import urlparse
+
+import boto3
+from botocore.config import Config
+
+from dcv_common import metrics
+from dcv_common.config import env_int
+
+SERVICES = ("dynamodb", "ec2", "kms")
+
+CLIENT_CONFIG = Config(
+    connect_timeout=env_int("DCV_AWS_CONNECT_TIMEOUT", 2),
+    read_timeout=env_int("DCV_AWS_READ_TIMEOUT", 5),
+    retries={
+        "mode": os.environ.get("DCV_AWS_RETRY_MODE", "standard"),
+        "total_max_attempts": env_int("DCV_AWS_MAX_ATTEMPTS", 3),
+    },
+    max_pool_connections=env_int("DCV_AWS_MAX_POOL_CONNECTIONS", 10),
+    tcp_keepalive=True,
+)
+
+_lock = threading.Lock()
+
+
+def __getattr__(name):
+    if name not in SERVICES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    with _lock:
+        if name not in globals():
+            globals()[name] = metrics.instrument(
+                boto3.client(name, config=CLIENT_CONFIG)
+            )
+    return globals()[name]
+
+
+def warmup(*services):
+    """Creates clients and resolves their endpoints ahead of the first request.
+
+    Only runs in the init phase of provisioned concurrency environments, where
+    init is not on the request path; on-demand cold starts keep creating
+    clients lazily.
+    """
+    if os.environ.get("AWS_LAMBDA_INITIALIZATION_TYPE") != "provisioned-concurrency":
+        return
+    for name in services:
+        endpoint = urlparse(__getattr__(name).meta.endpoint_url)
+        try:
+            socket.getaddrinfo(endpoint.hostname, endpoint.port or 443)
+        except socket.gaierror:
+            pass
@@ -0,0 +1,16 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import os
+
+
+def env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def env_bool(name, default=False):
+    return os.environ.get(name, "true" if default else "false") == "true"
+
+
+TABLE_NAME = os.environ.get("DCV_TABLE_NAME")
+KMS_KEY = os.environ.get("DCV_KMS_KEY")
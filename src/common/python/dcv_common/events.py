@@ -0,0 +1,56 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import base64
+import ipaddress
+from urllib import parse
+
+
+def is_alb_event(event):
+    return "elb" in (event.get("requestContext") or {})
+
+
+def get_body(event):
+    """The request body as text, decoded when the front end base64 encoded it."""
+    body = event.get("body") or ""
+    if body and event.get("isBase64Encoded"):
+        body = base64.b64decode(body).decode()
+    return body
+
+
+def get_source_ip(event):
+    """The IP address of the caller connecting to the front end.
+
+    API Gateway provides it in the request context. An ALB appends it to
+    X-Forwarded-For, where only the last entry was not set by the caller.
+    """
+    if is_alb_event(event):
+        forwarded_for = (event.get("headers") or {}).get("x-forwarded-for", "")
+        return forwarded_for.split(",")[-1].strip() or None
+    return ((event.get("requestContext") or {}).get("identity") or {}).get("sourceIp")
+
+
+def get_params(event):
+    """Query string parameters merged with a form encoded body.
+
+    Raises ValueError when the body cannot be decoded.
+    """
+    params = dict(event.get("queryStringParameters") or {})
+    if is_alb_event(event):
+        # unlike API Gateway, an ALB passes the query string still encoded
+        params = {
+            parse.unquote_plus(name): parse.unquote_plus(value)
+            for name, value in params.items()
+        }
+    body = get_body(event)
+    if body:
+        params.update(parse.parse_qsl(body))
+    return params
+
+
+def is_ip_address(value):
+    try:
+        ipaddress.ip_address(value)
+    except ValueError:
+        return False
+    return True
@@ -0,0 +1,68 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import time
+
+from botocore.exceptions import ClientError
+
+from dcv_common import clients, metrics
+from dcv_common.cache import MISSING, TTLCache
+from dcv_common.config import env_int
+
+INSTANCE_CACHE_TTL = env_int("INSTANCE_CACHE_TTL", 300)
+INSTANCE_CACHE_NEGATIVE_TTL = env_int("INSTANCE_CACHE_NEGATIVE_TTL", 30)
+INSTANCE_CACHE_SIZE = env_int("INSTANCE_CACHE_SIZE", 1024)
+
+# AWS limit for the values of a single DescribeInstances filter
+DESCRIBE_FILTER_MAX_VALUES = 200
+
+
+# unknown instances are cached as None, for a shorter time, so that repeated
+# lookups of a bad instance id do not reach the EC2 API either
+instance_cache = TTLCache(INSTANCE_CACHE_SIZE)
+
+
+def get_instance(instance_id):
+    response = clients.ec2.describe_instances(InstanceIds=[instance_id])
+    return response["Reservations"][0]["Instances"][0]
+
+
+def get_instances(instance_ids):
+    """Describes many instances at once, unknown instance ids are left out."""
+    instances = {}
+    paginator = clients.ec2.get_paginator("describe_instances")
+    for i in range(0, len(instance_ids), DESCRIBE_FILTER_MAX_VALUES):
+        chunk = instance_ids[i : i + DESCRIBE_FILTER_MAX_VALUES]
+        for page in paginator.paginate(
+            Filters=[{"Name": "instance-id", "Values": chunk}]
+        ):
+            for reservation in page["Reservations"]:
+                for instance in reservation["Instances"]:
+                    instances[instance["InstanceId"]] = instance
+    return instances
+
+
+def get_instance_tags(instance):
+    return dict((tag["Key"], tag["Value"]) for tag in instance.get("Tags", []))
+
+
+def describe_instance_ip(instance_id):
+    try:
+        instance = get_instance(instance_id)
+    except ClientError as e:
+        if e.response["Error"]["Code"].startswith("InvalidInstanceID"):
+            return None
+        raise
+    except IndexError:
+        return None
+    return instance.get("PrivateIpAddress")
+
+
+def get_instance_ip(instance_id):
+    instance_ip = instance_cache.get(instance_id)
+    metrics.count("InstanceCacheHit", int(instance_ip is not MISSING))
+    if instance_ip is MISSING:
+        instance_ip = describe_instance_ip(instance_id)
+        ttl = INSTANCE_CACHE_TTL if instance_ip else INSTANCE_CACHE_NEGATIVE_TTL
+        instance_cache.put(instance_id, instance_ip, time.time() + ttl)
+    return instance_ip
@@ -0,0 +1,156 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""CloudWatch embedded metric format (EMF) metrics for the handlers.
+
+Each invocation of a handler wrapped with ``handler()`` prints one EMF
+document with its duration, whether it was a cold start, the latency of
+every AWS call it made (``dynamodb.GetItem``, ``kms.Decrypt``, ...) and
+any counters recorded on the way. Cache lookups count 1 for a hit and 0
+for a miss, so the metric's average is the hit rate. Rejections are printed
+as a separate document with the reason as a dimension:
+
+    @metrics.handler("resolver")
+    def handler(event, context):
+        ...
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+from dcv_common.config import env_bool
+
+ENABLED = env_bool("DCV_METRICS", default=True)
+NAMESPACE = os.environ.get("DCV_METRICS_NAMESPACE", "DcvWithGateway")
+
+_lock = threading.Lock()
+_cold_start = True
+# values recorded during the current invocation, by metric name
+_values = defaultdict(list)
+_units = {}
+_rejections = []
+
+
+def record(name, value, unit="Milliseconds"):
+    # without handler() nothing flushes, so nothing may be kept either
+    if not ENABLED:
+        return
+    with _lock:
+        _values[name].append(value)
+        _units[name] = unit
+
+
+def count(name, value=1):
+    record(name, value, unit="Count")
+
+
+def reject(reason):
+    """Counts a request refused with the given reason."""
+    if not ENABLED:
+        return
+    with _lock:
+        _rejections.append(reason)
+
+
+def _before_call(context, **kwargs):
+    context["dcv_metrics_start"] = time.perf_counter()
+
+
+def _after_call(model, context, **kwargs):
+    start = context.get("dcv_metrics_start")
+    if start is not None:
+        record(
+            f"{model.service_model.service_name}.{model.name}",
+            round((time.perf_counter() - start) * 1000, 3),
+        )
+
+
+def instrument(client):
+    """Times every call made through a boto3 client."""
+    if ENABLED:
+        client.meta.events.register("before-call.*.*", _before_call)
+        client.meta.events.register("after-call.*.*", _after_call)
+    return client
+
+
+def _document(function, metrics, dimensions, properties):
+    return json.dumps(
+        {
+            "_aws": {
+                "Timestamp": int(time.time() * 1000),
+                "CloudWatchMetrics": [
+                    {
+                        "Namespace": NAMESPACE,
+                        "Dimensions": [dimensions],
+                        "Metrics": [
+                            {"Name": name, "Unit": unit} for name, unit in metrics
+                        ],
+                    }
+                ],
+            },
+            "Function": function,
+            **properties,
+        }
+    )
+
+
+def flush(function):
+    with _lock:
+        values = dict(_values)
+        units = dict(_units)
+        rejections = list(_rejections)
+        _values.clear()
+        _units.clear()
+        _rejections.clear()
+
+    print(
+        _document(
+            function,
+            [(name, units[name]) for name in values],
+            ["Function"],
+            {
+                name: value[0] if len(value) == 1 else value
+                for name, value in values.items()
+            },
+        )
+    )
+    for reason in rejections:
+        print(
+            _document(
+                function,
+                [("Rejections", "Count")],
+                ["Function", "Reason"],
+                {"Reason": reason, "Rejections": 1},
+            )
+        )
+
+
+def handler(function):
+    """Decorates a Lambda handler to emit its metrics after every invocation."""
+
+    def decorator(func):
+        if not ENABLED:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(event, context):
+            global _cold_start
+            cold_start, _cold_start = _cold_start, False
+            start = time.perf_counter()
+            try:
+                return func(event, context)
+            except Exception:
+                count("Errors")
+                raise
+            finally:
+                record("Duration", round((time.perf_counter() - start) * 1000, 3))
+                count("ColdStart", int(cold_start))
+                flush(function)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,15 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import json
+
+from dcv_common import metrics
+
+
+def json_response(status_code, body):
+    return {"statusCode": status_code, "body": json.dumps(body)}
+
+
+def error_response(status_code, message):
+    metrics.reject(message)
+    return json_response(status_code, {"error": message})
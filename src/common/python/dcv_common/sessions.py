@@ -0,0 +1,102 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""Read path for session items.
+
+Handlers that only look sessions up read through ``create_session_store()``.
+Depending on configuration, reads go to the table directly or to a DAX
+cluster in front of it, optionally behind a short-lived in-process cache.
+Writes (activation, client binding) always go to DynamoDB through
+``clients.dynamodb``.
+"""
+
+import os
+import time
+
+from dcv_common import clients, metrics
+from dcv_common.cache import MISSING, TTLCache
+from dcv_common.config import TABLE_NAME, env_int
+
+DAX_ENDPOINT = os.environ.get("DCV_DAX_ENDPOINT")
+SESSION_CACHE_TTL = env_int("DCV_SESSION_CACHE_TTL", 0)
+SESSION_CACHE_SIZE = env_int("DCV_SESSION_CACHE_SIZE", 4096)
+
+# what resolving a session reads; the secret is left out so that readers such
+# as the resolver sidecar on the gateway hosts can be denied it
+RESOLVE_ATTRIBUTES = [
+    "session_id",
+    "instance_id",
+    "instance_ip",
+    "expire_at",
+    "client_ip",
+    "transports",
+    "tcp_port",
+    "udp_port",
+]
+
+
+class DynamoDBSessionStore:
+    """Reads session items from the table, or from a DAX cluster in front of it.
+
+    Items hold the RESOLVE_ATTRIBUTES only.
+    """
+
+    def __init__(self, dax_endpoint=None):
+        self.dax_endpoint = dax_endpoint
+        self._dax = None
+
+    @property
+    def client(self):
+        if not self.dax_endpoint:
+            return clients.dynamodb
+        if self._dax is None:
+            # amazon-dax-client is only deployed when DAX is enabled
+            from amazondax import AmazonDaxClient
+
+            self._dax = AmazonDaxClient(endpoint_url=self.dax_endpoint)
+        return self._dax
+
+    def get(self, session_id):
+        response = self.client.get_item(
+            TableName=TABLE_NAME,
+            Key={"session_id": {"S": session_id}},
+            ProjectionExpression=", ".join(
+                f"#{index}" for index in range(len(RESOLVE_ATTRIBUTES))
+            ),
+            ExpressionAttributeNames={
+                f"#{index}": name for index, name in enumerate(RESOLVE_ATTRIBUTES)
+            },
+        )
+        return response.get("Item")
+
+
+class CachedSessionStore:
+    """Read-through cache in front of another store.
+
+    Entries live for ``ttl`` seconds at most and never past the session's
+    ``expire_at``; unknown sessions are not cached. Revocations and
+    activations are written by other functions, so entries are never
+    invalidated: a revoked session is served until its entry expires.
+    """
+
+    def __init__(self, store, ttl, max_size):
+        self.store = store
+        self.ttl = ttl
+        self._cache = TTLCache(max_size)
+
+    def get(self, session_id):
+        item = self._cache.get(session_id)
+        metrics.count("SessionCacheHit", int(item is not MISSING))
+        if item is MISSING:
+            item = self.store.get(session_id)
+            if item is not None:
+                expires_at = min(time.time() + self.ttl, int(item["expire_at"]["N"]))
+                self._cache.put(session_id, item, expires_at)
+        return item
+
+
+def create_session_store():
+    store = DynamoDBSessionStore(DAX_ENDPOINT)
+    if SESSION_CACHE_TTL > 0:
+        store = CachedSessionStore(store, SESSION_CACHE_TTL, SESSION_CACHE_SIZE)
+    return store
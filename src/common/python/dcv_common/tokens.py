@@ -0,0 +1,121 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""Session auth tokens.
+
+Two formats are accepted so that both can coexist during a rollout:
+
+- ``kms``: the {session_id, secret} payload encrypted by KMS, base64 encoded.
+- ``local``: ``dk1.<wrapped key>.<payload>.<hmac>``, the payload signed with a
+  KMS data key that travels KMS-wrapped inside the token. Data keys are
+  generated and unwrapped once per container, so no KMS call is made per token.
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from dcv_common import clients
+from dcv_common.config import KMS_KEY, env_int
+
+TOKEN_MODE = os.environ.get("DCV_TOKEN_MODE", "kms")
+DATA_KEY_MAX_AGE = env_int("DCV_DATA_KEY_MAX_AGE", 3600)
+DATA_KEY_CACHE_SIZE = env_int("DCV_DATA_KEY_CACHE_SIZE", 16)
+
+LOCAL_TOKEN_PREFIX = "dk1"
+DATA_KEY_ENCRYPTION_CONTEXT = {"purpose": "dcv-session-token"}
+
+# (expires_at, plaintext key, base64 KMS-wrapped key) used to sign new tokens
+data_key = None
+data_key_lock = threading.Lock()
+# KMS-wrapped data key -> plaintext key, used to verify tokens
+data_keys = OrderedDict()
+
+
+def get_signing_key():
+    global data_key
+    key = data_key
+    if key is None or key[0] < time.monotonic():
+        with data_key_lock:
+            # another thread may have refreshed the key while this one waited
+            key = data_key
+            if key is None or key[0] < time.monotonic():
+                response = clients.kms.generate_data_key(
+                    KeyId=KMS_KEY,
+                    KeySpec="AES_256",
+                    EncryptionContext=DATA_KEY_ENCRYPTION_CONTEXT,
+                )
+                key = data_key = (
+                    time.monotonic() + DATA_KEY_MAX_AGE,
+                    response["Plaintext"],
+                    base64.urlsafe_b64encode(response["CiphertextBlob"]).decode(),
+                )
+    return key[1], key[2]
+
+
+def get_verification_key(wrapped_key):
+    key = data_keys.get(wrapped_key)
+    if key is not None:
+        data_keys.move_to_end(wrapped_key)
+        return key
+
+    key = clients.kms.decrypt(
+        KeyId=KMS_KEY,
+        CiphertextBlob=base64.urlsafe_b64decode(wrapped_key),
+        EncryptionContext=DATA_KEY_ENCRYPTION_CONTEXT,
+    )["Plaintext"]
+    data_keys[wrapped_key] = key
+    while len(data_keys) > DATA_KEY_CACHE_SIZE:
+        data_keys.popitem(last=False)
+    return key
+
+
+def seal_local_token(payload):
+    key, wrapped_key = get_signing_key()
+    message = ".".join(
+        [
+            LOCAL_TOKEN_PREFIX,
+            wrapped_key,
+            base64.urlsafe_b64encode(payload.encode()).decode(),
+        ]
+    )
+    signature = hmac.new(key, message.encode(), hashlib.sha256).digest()
+    return f"{message}.{base64.urlsafe_b64encode(signature).decode()}"
+
+
+def open_local_token(token):
+    message, _, signature = token.rpartition(".")
+    _, wrapped_key, payload = message.split(".")
+    expected = hmac.new(
+        get_verification_key(wrapped_key), message.encode(), hashlib.sha256
+    ).digest()
+    if not hmac.compare_digest(expected, base64.urlsafe_b64decode(signature)):
+        raise ValueError("Invalid token signature")
+    return json.loads(base64.urlsafe_b64decode(payload))
+
+
+def create_auth_token(session_id, secret):
+    payload = json.dumps({"session_id": session_id, "secret": secret})
+    if TOKEN_MODE == "local":
+        return seal_local_token(payload)
+
+    auth_token_bytes = clients.kms.encrypt(KeyId=KMS_KEY, Plaintext=payload)[
+        "CiphertextBlob"
+    ]
+    return base64.urlsafe_b64encode(auth_token_bytes).decode()
+
+
+def open_auth_token(token):
+    if token.startswith(f"{LOCAL_TOKEN_PREFIX}."):
+        return open_local_token(token)
+
+    token_bytes = base64.urlsafe_b64decode(token)
+    token_string = clients.kms.decrypt(KeyId=KMS_KEY, CiphertextBlob=token_bytes)[
+        "Plaintext"
+    ].decode()
+    return json.loads(token_string)
@@ -2,72 +2,307 @@
 # SPDX-License-Identifier: MIT-0
 
 import json
-import os
 import secrets
-import base64
 
-import boto3
 import time
 import uuid
 from botocore.exceptions import ClientError
+from concurrent.futures import ThreadPoolExecutor
 
-ec2 = boto3.client("ec2")
-dynamodb = boto3.client("dynamodb")
-kms = boto3.client("kms")
+from dcv_common import clients, metrics
+from dcv_common.config import TABLE_NAME, env_int
+from dcv_common.instances import get_instance, get_instances, get_instance_tags
+from dcv_common.responses import error_response, json_response
+from dcv_common.tokens import TOKEN_MODE, create_auth_token
 
-TABLE_NAME = os.environ.get("DCV_TABLE_NAME")
-KMS_KEY = os.environ.get("DCV_KMS_KEY")
-SESSION_LIFETIME = int(os.environ.get("SESSION_LIFETIME", 3600))
+SESSION_LIFETIME = env_int("SESSION_LIFETIME", 3600)
+BATCH_MAX_INSTANCES = env_int("BATCH_MAX_INSTANCES", 500)
+# matches the connection pool size of the shared clients
+BATCH_CONCURRENCY = env_int("BATCH_CONCURRENCY", 10)
+BATCH_WRITE_ATTEMPTS = 5
 
+# AWS limit for a single BatchWriteItem call
+BATCH_WRITE_MAX_ITEMS = 25
 
-def get_instance_tags(instance_id):
-    response = ec2.describe_instances(InstanceIds=[instance_id])
-    tags = response["Reservations"][0]["Instances"][0]["Tags"]
-    return dict((tag["Key"], tag["Value"]) for tag in tags)
+DEFAULT_TCP_PORT = 8443
+DEFAULT_UDP_PORT = 8443
 
+# sessions requested with an Idempotency-Key get ids derived from the request
+IDEMPOTENCY_NAMESPACE = uuid.UUID("fbab3b97-c695-497d-b214-d9af31b0cb54")
 
+
+def is_server(tags):
+    return tags.get("dcv:type") == "server" and bool(tags.get("dcv:user"))
+
+
+def get_port(tags, name, default):
+    """Returns the port set by an instance tag, raises ValueError if invalid."""
+    try:
+        port = int(tags.get(name, default))
+    except ValueError:
+        port = 0
+    if not 1 <= port <= 65535:
+        raise ValueError(f"Invalid {name} tag")
+    return port
+
+
+def get_instance_endpoint(instance, tags):
+    """Returns the session's endpoint attributes, raises ValueError on bad tags."""
+    endpoint = {
+        "tcp_port": {"N": str(get_port(tags, "dcv:tcp-port", DEFAULT_TCP_PORT))},
+        "udp_port": {"N": str(get_port(tags, "dcv:udp-port", DEFAULT_UDP_PORT))},
+        "transports": {
+            "SS": ["HTTP"] if tags.get("dcv:quic") == "false" else ["HTTP", "QUIC"]
+        },
+    }
+    if instance.get("PrivateIpAddress"):
+        endpoint["instance_ip"] = {"S": instance["PrivateIpAddress"]}
+    return endpoint
+
+
+def new_secret():
+    return str(secrets.token_urlsafe(64))
+
+
+def new_session(instance_id, instance, tags, session_id=None, secret=None):
+    session_id = session_id or str(uuid.uuid4())
+    secret = secret or new_secret()
+    now = int(time.time())
+    item = {
+        "session_id": {"S": session_id},
+        "secret": {"S": secret},
+        "instance_id": {"S": instance_id},
+        "username": {"S": tags.get("dcv:user")},
+        "created_at": {"N": str(now)},
+        "expire_at": {"N": str(now + SESSION_LIFETIME)},
+        # TTL attribute, extended by the authenticator once the session is used
+        "ttl": {"N": str(now + SESSION_LIFETIME)},
+        "activated_at": {"N": "0"},
+        **get_instance_endpoint(instance, tags),
+    }
+    return session_id, secret, item
+
+
+def get_idempotency_key(event):
+    for name, value in (event.get("headers") or {}).items():
+        if name.lower() == "idempotency-key" and value:
+            return value
+    return None
+
+
+def get_caller(event):
+    identity = (event.get("requestContext") or {}).get("identity") or {}
+    return identity.get("userArn") or identity.get("caller") or ""
+
+
+def put_idempotent_session(instance_id, instance, tags, caller, idempotency_key):
+    """Stores a session under an id derived from the request, or reuses it.
+
+    Repeats of a request get the session the first one stored, as long as it
+    is unexpired and unactivated. KMS tokens are stored on the item for the
+    repeats to return; local tokens, which need no KMS call, and repeats that
+    race the token write are minted again from the stored secret. Returns
+    (session_id, auth_token), or None when the id is held by a session that
+    can no longer be handed out.
+    """
+    session_id = str(
+        uuid.uuid5(
+            IDEMPOTENCY_NAMESPACE, "\n".join([instance_id, caller, idempotency_key])
+        )
+    )
+    session_id, secret, item = new_session(instance_id, instance, tags, session_id)
+    try:
+        clients.dynamodb.put_item(
+            TableName=TABLE_NAME,
+            Item=item,
+            ConditionExpression="attribute_not_exists(#session_id)",
+            ExpressionAttributeNames={"#session_id": "session_id"},
+            ReturnValuesOnConditionCheckFailure="ALL_OLD",
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "ConditionalCheckFailedException":
+            raise
+        existing = e.response.get("Item")
+        if (
+            existing is None
+            or int(existing["activated_at"]["N"]) > 0
+            or int(existing["expire_at"]["N"]) < int(time.time())
+        ):
+            return None
+        auth_token = existing.get("auth_token", {}).get("S")
+        return session_id, auth_token or create_auth_token(
+            session_id, existing["secret"]["S"]
+        )
+
+    auth_token = create_auth_token(session_id, secret)
+    if TOKEN_MODE == "kms":
+        # minted once the put succeeded, so repeats never call KMS; the
+        # resolver and gateway roles cannot read the attribute
+        clients.dynamodb.update_item(
+            TableName=TABLE_NAME,
+            Key={"session_id": {"S": session_id}},
+            UpdateExpression="SET #auth_token = :auth_token",
+            ConditionExpression="attribute_exists(#session_id)",
+            ExpressionAttributeNames={
+                "#session_id": "session_id",
+                "#auth_token": "auth_token",
+            },
+            ExpressionAttributeValues={":auth_token": {"S": auth_token}},
+        )
+    return session_id, auth_token
+
+
+# created once per container and shared by warm invocations
+executor = ThreadPoolExecutor(max_workers=BATCH_CONCURRENCY)
+
+
+def write_items(items):
+    """Writes items in BatchWriteItem chunks, returns the items left unprocessed."""
+
+    def write_chunk(chunk):
+        requests = [{"PutRequest": {"Item": item}} for item in chunk]
+        for attempt in range(BATCH_WRITE_ATTEMPTS):
+            if attempt:
+                time.sleep(0.05 * 2**attempt)
+            try:
+                response = clients.dynamodb.batch_write_item(
+                    RequestItems={TABLE_NAME: requests}
+                )
+            except ClientError:
+                break
+            requests = response.get("UnprocessedItems", {}).get(TABLE_NAME, [])
+            if not requests:
+                return []
+        return [request["PutRequest"]["Item"] for request in requests]
+
+    chunks = [
+        items[i : i + BATCH_WRITE_MAX_ITEMS]
+        for i in range(0, len(items), BATCH_WRITE_MAX_ITEMS)
+    ]
+    return [
+        item
+        for unprocessed in executor.map(write_chunk, chunks)
+        for item in unprocessed
+    ]
+
+
+def create_sessions(event):
+    try:
+        instance_ids = json.loads(event.get("body") or "{}")["instanceIds"]
+    except (ValueError, KeyError, TypeError):
+        instance_ids = None
+    if not isinstance(instance_ids, list) or not all(
+        isinstance(instance_id, str) for instance_id in instance_ids
+    ):
+        return error_response(400, "Body must contain a list of instanceIds")
+
+    instance_ids = list(dict.fromkeys(instance_ids))
+    if not instance_ids or len(instance_ids) > BATCH_MAX_INSTANCES:
+        return error_response(
+            400, f"Between 1 and {BATCH_MAX_INSTANCES} instanceIds required"
+        )
+
+    instances = get_instances(instance_ids)
+
+    errors = []
+    pending = []
+    for instance_id in instance_ids:
+        if instance_id not in instances:
+            errors.append({"instanceId": instance_id, "error": "Invalid instanceId"})
+            continue
+        tags = get_instance_tags(instances[instance_id])
+        if not is_server(tags):
+            errors.append(
+                {"instanceId": instance_id, "error": "Instance has no required tags"}
+            )
+            continue
+        try:
+            pending.append(new_session(instance_id, instances[instance_id], tags))
+        except ValueError as e:
+            errors.append({"instanceId": instance_id, "error": str(e)})
+
+    def mint(session):
+        session_id, secret, item = session
+        try:
+            return create_auth_token(session_id, secret)
+        except ClientError:
+            return None
+
+    sessions = []
+    items = []
+    for (session_id, secret, item), auth_token in zip(
+        pending, executor.map(mint, pending)
+    ):
+        instance_id = item["instance_id"]["S"]
+        if auth_token is None:
+            errors.append(
+                {"instanceId": instance_id, "error": "Token could not be created"}
+            )
+            continue
+        sessions.append(
+            {
+                "instanceId": instance_id,
+                "sessionId": session_id,
+                "authToken": auth_token,
+            }
+        )
+        items.append(item)
+
+    unprocessed = {item["session_id"]["S"] for item in write_items(items)}
+    errors.extend(
+        {"instanceId": session["instanceId"], "error": "Session could not be stored"}
+        for session in sessions
+        if session["sessionId"] in unprocessed
+    )
+    sessions = [
+        session for session in sessions if session["sessionId"] not in unprocessed
+    ]
+
+    return json_response(200, {"sessions": sessions, "errors": errors})
+
+
+@metrics.handler("create_session")
 def handler(event, context):
+    if event.get("resource") == "/sessions":
+        return create_sessions(event)
+
     if not "instanceId" in event["queryStringParameters"]:
-        return {
-            "statusCode": 400,
-            "body": json.dumps({"error": "Parameter instanceId is required"}),
-        }
+        return error_response(400, "Parameter instanceId is required")
 
     instance_id = event["queryStringParameters"]["instanceId"]
+    idempotency_key = get_idempotency_key(event)
+
     try:
-        tags = get_instance_tags(instance_id)
+        instance = get_instance(instance_id)
     except ClientError:
-        return {"statusCode": 404, "body": json.dumps({"error": "Invalid instanceId"})}
-
-    if tags.get("dcv:type") != "server" or not tags.get("dcv:user"):
-        return {
-            "statusCode": 400,
-            "body": json.dumps({"error": "Instance has no required tags"}),
-        }
-
-    session_id = str(uuid.uuid4())
-    secret = str(secrets.token_urlsafe(64))
-
-    auth_token_bytes = kms.encrypt(
-        KeyId=KMS_KEY,
-        Plaintext=json.dumps({"session_id": session_id, "secret": secret}),
-    )["CiphertextBlob"]
-    auth_token = base64.urlsafe_b64encode(auth_token_bytes)
-
-    dynamodb.put_item(
-        TableName=TABLE_NAME,
-        Item={
-            "session_id": {"S": session_id},
-            "secret": {"S": secret},
-            "instance_id": {"S": instance_id},
-            "username": {"S": tags.get("dcv:user")},
-            "created_at": {"N": str(int(time.time()))},
-            "expire_at": {"N": str(int(time.time()) + SESSION_LIFETIME)},
-            "activated_at": {"N": "0"},
-        },
-    )
+        return error_response(404, "Invalid instanceId")
 
-    return {
-        "statusCode": 200,
-        "body": json.dumps({"authToken": auth_token.decode(), "sessionId": session_id}),
-    }
+    tags = get_instance_tags(instance)
+    if not is_server(tags):
+        return error_response(400, "Instance has no required tags")
+
+    try:
+        get_instance_endpoint(instance, tags)
+    except ValueError as e:
+        return error_response(400, str(e))
+
+    if idempotency_key:
+        session = put_idempotent_session(
+            instance_id, instance, tags, get_caller(event), idempotency_key
+        )
+        if session is not None:
+            session_id, auth_token = session
+            return json_response(
+                200, {"authToken": auth_token, "sessionId": session_id}
+            )
+
+    # the token does not depend on the item, so it is minted while the item is
+    # stored; should minting fail, the item is never handed out and expires
+    session_id, secret = str(uuid.uuid4()), new_secret()
+    pending_token = executor.submit(create_auth_token, session_id, secret)
+    _, _, item = new_session(instance_id, instance, tags, session_id, secret)
+    clients.dynamodb.put_item(TableName=TABLE_NAME, Item=item)
+
+    auth_token = pending_token.result()
+
+    return json_response(200, {"authToken": auth_token, "sessionId": session_id})
@@ -1,70 +1,144 @@
 # Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 # SPDX-License-Identifier: MIT-0
 
-import json
-import os
 import time
-import boto3
 from botocore.exceptions import ClientError
 
-ec2 = boto3.client("ec2")
-dynamodb = boto3.client("dynamodb")
-kms = boto3.client("kms")
+from dcv_common import clients, metrics
+from dcv_common.cache import MISSING, TTLCache
+from dcv_common.config import TABLE_NAME, env_bool, env_int
+from dcv_common.events import get_params, is_ip_address
+from dcv_common.instances import get_instance_ip
+from dcv_common.responses import error_response, json_response
+from dcv_common.sessions import create_session_store
 
-TABLE_NAME = os.environ.get("DCV_TABLE_NAME")
-KMS_KEY = os.environ.get("DCV_KMS_KEY")
+REFRESH_INSTANCE_IP = env_bool("DCV_REFRESH_INSTANCE_IP")
+CLIENT_AFFINITY = env_bool("DCV_RESOLVER_CLIENT_AFFINITY")
+RESPONSE_CACHE_TTL = env_int("DCV_RESOLVER_CACHE_TTL", 10)
+RESPONSE_CACHE_SIZE = env_int("DCV_RESOLVER_CACHE_SIZE", 4096)
 
-TCP_PORT = 8443
-UDP_PORT = 8443
+DEFAULT_TCP_PORT = 8443
+DEFAULT_UDP_PORT = 8443
 
+clients.warmup("dynamodb")
 
-def get_instance_ip(instance_id):
-    response = ec2.describe_instances(InstanceIds=[instance_id])
-    private_ip_addr = response["Reservations"][0]["Instances"][0]["PrivateIpAddress"]
-    return private_ip_addr
+# The gateway resolves the same session several times per connection (QUIC
+# attempt, HTTP fallback, reconnects). Routing data never changes, and a
+# revoked session served from here is still refused by the authenticator.
+response_cache = TTLCache(RESPONSE_CACHE_SIZE)
+session_store = create_session_store()
 
 
-# https://docs.aws.amazon.com/dcv/latest/gw-admin/session-resolver.html#implementing-session-resolver
-def handler(event, context):
+def bind_client(item, client_ip):
+    """Binds the session to the first client resolving it, False if bound elsewhere."""
+    bound_ip = item.get("client_ip", {}).get("S")
+    if bound_ip is not None:
+        return bound_ip == client_ip
+    try:
+        clients.dynamodb.update_item(
+            TableName=TABLE_NAME,
+            Key={"session_id": item["session_id"]},
+            UpdateExpression="SET #client_ip = :client_ip",
+            ConditionExpression=(
+                "attribute_not_exists(#client_ip) OR #client_ip = :client_ip"
+            ),
+            ExpressionAttributeNames={"#client_ip": "client_ip"},
+            ExpressionAttributeValues={":client_ip": {"S": client_ip}},
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+            return False
+        raise
+    # items may be shared with the session cache, record the binding there too
+    item["client_ip"] = {"S": client_ip}
+    return True
+
+
+def parse_request(event):
+    """Returns the request's response cache key, raises ValueError if invalid.
+
+    The key is (session_id, transport, client_ip), the client IP only taking
+    part with client affinity.
+    """
     # Gateway POST - sessionId=session_id&transport=transport&clientIpAddress=clientIpAddress
-    session_id = event["queryStringParameters"]["sessionId"]
-    transport = event["queryStringParameters"]["transport"]
+    try:
+        params = get_params(event)
+    except ValueError:
+        raise ValueError("Malformed request")
+
+    session_id = params.get("sessionId")
+    transport = params.get("transport")
+    client_ip = params.get("clientIpAddress")
 
-    if session_id is None:
-        return {
-            "statusCode": 400,
-            "body": json.dumps({"error": "Missing sessionId parameter"}),
-        }
+    if not session_id:
+        raise ValueError("Missing sessionId parameter")
 
     if transport not in ["HTTP", "QUIC"]:
-        return {
-            "statusCode": 400,
-            "body": json.dumps({"error": "Invalid transport parameter"}),
-        }
+        raise ValueError("Invalid transport parameter")
+
+    if client_ip is not None and not is_ip_address(client_ip):
+        raise ValueError("Invalid clientIpAddress parameter")
+
+    return session_id, transport, client_ip if CLIENT_AFFINITY else None
+
 
+def cached_response(event):
+    """Returns the cached answer to a request, MISSING if it has to be resolved."""
     try:
-        item = dynamodb.get_item(
-            TableName=TABLE_NAME, Key={"session_id": {"S": session_id}}
-        )
-        if not "Item" in item:
-            return {
-                "statusCode": 404,
-                "body": json.dumps({"error": "Unknown sessionId"}),
-            }
+        return response_cache.get(parse_request(event))
+    except ValueError:
+        return MISSING
+
+
+# https://docs.aws.amazon.com/dcv/latest/gw-admin/session-resolver.html#implementing-session-resolver
+@metrics.handler("resolver")
+def handler(event, context):
+    try:
+        cache_key = parse_request(event)
+    except ValueError as e:
+        return error_response(400, str(e))
+    # the client IP is only kept with client affinity, the only place it is used
+    session_id, transport, client_ip = cache_key
+    # sessions bound to clients are not handed to unidentified ones
+    if CLIENT_AFFINITY and not client_ip:
+        return error_response(404, "Unknown sessionId")
 
-        expire_at = int(item["Item"]["expire_at"]["N"])
+    response = response_cache.get(cache_key)
+    metrics.count("ResolverCacheHit", int(response is not MISSING))
+    if response is not MISSING:
+        return response
+
+    try:
+        item = session_store.get(session_id)
+        if item is None:
+            return error_response(404, "Unknown sessionId")
+
+        expire_at = int(item["expire_at"]["N"])
         if expire_at < int(time.time()):
-            return {
-                "statusCode": 400,
-                "body": json.dumps({"error": "Expired sessionId"}),
-            }
+            return error_response(400, "Expired sessionId")
 
-        instance_id = item["Item"]["instance_id"]["S"]
-        instance_ip = get_instance_ip(instance_id)
+        # sessions created before the IP was stored on the item, or deployments
+        # where instances may be replaced mid-session, fall back to EC2
+        instance_ip = item.get("instance_ip", {}).get("S")
+        if instance_ip is None or REFRESH_INSTANCE_IP:
+            instance_ip = get_instance_ip(item["instance_id"]["S"])
+
+        if CLIENT_AFFINITY and not bind_client(item, client_ip):
+            return error_response(403, "Session bound to another client")
     except ClientError as e:
-        return {"statusCode": 404, "body": json.dumps({"error": "Unknown sessionId"})}
+        return error_response(404, "Unknown sessionId")
+
+    if instance_ip is None:
+        return error_response(404, "Unknown sessionId")
+
+    transports = item.get("transports", {}).get("SS", ["HTTP", "QUIC"])
+    if transport not in transports:
+        return error_response(400, "Transport not supported by instance")
 
-    port = int(TCP_PORT if transport == "HTTP" else UDP_PORT)
+    if transport == "HTTP":
+        port = int(item.get("tcp_port", {}).get("N", DEFAULT_TCP_PORT))
+    else:
+        port = int(item.get("udp_port", {}).get("N", DEFAULT_UDP_PORT))
     session_details = {
         "SessionId": "console",
         "DcvServerEndpoint": instance_ip,
@@ -72,4 +146,8 @@ def handler(event, context):
         "WebUrlPath": "/",
         "TransportProtocol": transport,
     }
-    return {"statusCode": 200, "body": json.dumps(session_details)}
+    response = json_response(200, session_details)
+    response_cache.put(
+        cache_key, response, min(time.time() + RESPONSE_CACHE_TTL, expire_at)
+    )
+    return response
@@ -0,0 +1,141 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""Session resolver served on the gateway host.
+
+Runs the resolver function's handler behind a minimal asyncio HTTP/1.1
+server on the loopback interface, so the gateway resolves sessions without
+leaving the host. Sessions and answers are cached in process between
+requests; cached answers are served on the event loop, misses run the
+handler in a thread and read the same DynamoDB table as the resolver
+function.
+
+    python3 server.py
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sys
+from http import HTTPStatus
+from urllib import parse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, "common", "python"))
+sys.path.insert(0, os.path.join(ROOT, "resolver"))
+
+import index as resolver  # noqa: E402
+
+HOST = os.environ.get("DCV_RESOLVER_SIDECAR_HOST", "127.0.0.1")
+PORT = int(os.environ.get("DCV_RESOLVER_SIDECAR_PORT", "8445"))
+MAX_BODY_SIZE = 64 * 1024
+
+
+def to_event(method, target, body):
+    """The API Gateway event the resolver function would get for the request."""
+    url = parse.urlsplit(target)
+    return {
+        "resource": url.path,
+        "httpMethod": method,
+        "queryStringParameters": dict(parse.parse_qsl(url.query)) or None,
+        "requestContext": {"identity": {"sourceIp": "127.0.0.1"}},
+        "body": body,
+        "isBase64Encoded": False,
+    }
+
+
+def to_http(status_code, body, keep_alive):
+    reason = HTTPStatus(status_code).phrase
+    body = body.encode()
+    headers = [
+        f"HTTP/1.1 {status_code} {reason}",
+        "Content-Type: application/json",
+        f"Content-Length: {len(body)}",
+        f"Connection: {'keep-alive' if keep_alive else 'close'}",
+    ]
+    return ("\r\n".join(headers) + "\r\n\r\n").encode() + body
+
+
+async def read_request(reader):
+    """Reads one request, returns (method, target, keep_alive, body) or None at EOF."""
+    try:
+        head = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError:
+        return None
+    request_line, *header_lines = head.decode("latin-1").split("\r\n")
+    method, target, version = request_line.split(" ", 2)
+    headers = {}
+    for line in header_lines:
+        if line:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+    length = int(headers.get("content-length", 0))
+    if length > MAX_BODY_SIZE:
+        raise ValueError("Request body too large")
+    body = (await reader.readexactly(length)).decode() if length else None
+    keep_alive = (
+        headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+    )
+    return method, target, keep_alive, body
+
+
+async def serve_connection(reader, writer):
+    loop = asyncio.get_running_loop()
+    try:
+        while True:
+            try:
+                request = await read_request(reader)
+            except (ValueError, asyncio.LimitOverrunError):
+                writer.write(
+                    to_http(400, json.dumps({"error": "Malformed request"}), False)
+                )
+                break
+            if request is None:
+                break
+            method, target, keep_alive, body = request
+
+            event = to_event(method, target, body)
+            if event["resource"] != "/resolveSession":
+                response = {
+                    "statusCode": 404,
+                    "body": json.dumps({"error": "Not found"}),
+                }
+            elif method != "POST":
+                response = {
+                    "statusCode": 405,
+                    "body": json.dumps({"error": "Method not allowed"}),
+                }
+            else:
+                # cached answers are served on the loop, misses block on
+                # DynamoDB and run in the executor
+                response = resolver.cached_response(event)
+                try:
+                    if response is resolver.MISSING:
+                        response = await loop.run_in_executor(
+                            None, resolver.handler, event, None
+                        )
+                except Exception:
+                    logging.exception("Resolving %s failed", target)
+                    response = {
+                        "statusCode": 500,
+                        "body": json.dumps({"error": "Internal error"}),
+                    }
+            writer.write(to_http(response["statusCode"], response["body"], keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def main():
+    server = await asyncio.start_server(serve_connection, HOST, PORT)
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,160 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import base64
+import json
+import time
+
+from botocore.exceptions import ClientError
+
+from dcv_common import clients, metrics
+from dcv_common.config import TABLE_NAME, env_bool, env_int
+from dcv_common.responses import error_response, json_response
+
+PAGE_SIZE = env_int("DCV_SESSIONS_PAGE_SIZE", 100)
+MAX_PAGE_SIZE = 1000
+# the ActiveByUser index is left out while a stack is upgraded
+USER_INDEX = env_bool("DCV_USER_INDEX", True)
+
+# query parameter -> (sparse index of activated sessions, its partition key)
+INDEXES = {
+    "instanceId": ("ActiveByInstance", "active_instance_id"),
+    "user": ("ActiveByUser", "active_username"),
+}
+
+
+def encode_next_token(last_evaluated_key):
+    return base64.urlsafe_b64encode(json.dumps(last_evaluated_key).encode()).decode()
+
+
+def decode_next_token(next_token, partition_key, value):
+    """Returns the ExclusiveStartKey of a nextToken, raises ValueError if invalid.
+
+    The key must come from a listing of the same index and partition.
+    """
+    try:
+        key = json.loads(base64.urlsafe_b64decode(next_token.encode()))
+    except ValueError:
+        raise ValueError("Invalid nextToken")
+    if (
+        not isinstance(key, dict)
+        or set(key) != {"session_id", "activated_at", partition_key}
+        or key[partition_key] != {"S": value}
+    ):
+        raise ValueError("Invalid nextToken")
+    return key
+
+
+def to_session(item):
+    session = {
+        "sessionId": item["session_id"]["S"],
+        "instanceId": item["instance_id"]["S"],
+        "user": item["username"]["S"],
+        "createdAt": int(item["created_at"]["N"]),
+        "activatedAt": int(item["activated_at"]["N"]),
+        "expireAt": int(item["expire_at"]["N"]),
+    }
+    if "instance_ip" in item:
+        session["instanceIp"] = item["instance_ip"]["S"]
+    if "client_ip" in item:
+        session["clientIp"] = item["client_ip"]["S"]
+    return session
+
+
+def list_sessions(event):
+    """Returns one page of active sessions of an instance or a user.
+
+    Sessions come from the sparse active session indexes, newest first. A
+    nextToken in the response continues the listing.
+    """
+    params = event.get("queryStringParameters") or {}
+    selectors = [name for name in INDEXES if params.get(name)]
+    if len(selectors) != 1:
+        return error_response(400, "Exactly one of instanceId or user is required")
+    if selectors[0] == "user" and not USER_INDEX:
+        return error_response(400, "Listing sessions by user is not enabled")
+    index_name, partition_key = INDEXES[selectors[0]]
+
+    try:
+        limit = int(params.get("limit", PAGE_SIZE))
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        return error_response(400, f"limit must be between 1 and {MAX_PAGE_SIZE}")
+
+    query = {
+        "TableName": TABLE_NAME,
+        "IndexName": index_name,
+        "KeyConditionExpression": "#partition_key = :value",
+        # sessions stay in the index until TTL removes them; sessions
+        # activated before the ttl attribute existed have none
+        "FilterExpression": "attribute_not_exists(#ttl) OR #ttl >= :now",
+        "ExpressionAttributeNames": {
+            "#partition_key": partition_key,
+            "#ttl": "ttl",
+        },
+        "ExpressionAttributeValues": {
+            ":value": {"S": params[selectors[0]]},
+            ":now": {"N": str(int(time.time()))},
+        },
+        "ScanIndexForward": False,
+        "Limit": limit,
+    }
+    if params.get("nextToken"):
+        try:
+            query["ExclusiveStartKey"] = decode_next_token(
+                params["nextToken"], partition_key, params[selectors[0]]
+            )
+        except ValueError as e:
+            return error_response(400, str(e))
+
+    try:
+        response = clients.dynamodb.query(**query)
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "ValidationException":
+            return error_response(400, "Invalid nextToken")
+        raise
+
+    body = {"sessions": [to_session(item) for item in response["Items"]]}
+    if "LastEvaluatedKey" in response:
+        body["nextToken"] = encode_next_token(response["LastEvaluatedKey"])
+    return json_response(200, body)
+
+
+def delete_session(event):
+    """Revokes a session, activated or not, by deleting its item.
+
+    Neither the resolver nor the authenticator accept the session afterwards.
+    A DCV connection that is already established is not closed.
+    """
+    session_id = (event.get("pathParameters") or {}).get("id")
+    if not session_id:
+        return error_response(400, "Parameter id is required")
+
+    try:
+        response = clients.dynamodb.delete_item(
+            TableName=TABLE_NAME,
+            Key={"session_id": {"S": session_id}},
+            ConditionExpression="attribute_exists(#session_id)",
+            ExpressionAttributeNames={"#session_id": "session_id"},
+            ReturnValues="ALL_OLD",
+        )
+    except ClientError as e:
+        if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+            return error_response(404, "Unknown sessionId")
+        raise
+
+    return json_response(
+        200,
+        {
+            "sessionId": session_id,
+            "instanceId": response["Attributes"]["instance_id"]["S"],
+        },
+    )
+
+
+@metrics.handler("sessions")
+def handler(event, context):
+    if event.get("httpMethod") == "DELETE":
+        return delete_session(event)
+    return list_sessions(event)
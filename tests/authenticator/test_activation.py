@@ -0,0 +1,104 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import boto3
+import pytest
+
+import events
+
+
+@pytest.fixture
+def session(aws):
+    instance_id, _ = aws.servers[0]
+    return events.body(
+        aws.create_session.handler(events.create_session(instance_id), None)
+    )
+
+
+def update_session(session, expression, values=None):
+    kwargs = {"ExpressionAttributeValues": values} if values else {}
+    boto3.client("dynamodb").update_item(
+        TableName="DcvAccessManagement",
+        Key={"session_id": {"S": session["sessionId"]}},
+        UpdateExpression=expression,
+        **kwargs,
+    )
+
+
+def authenticate(aws, session, source_ip):
+    response = aws.authenticator.handler(
+        events.authenticate(session["authToken"], source_ip), None
+    )
+    return response["statusCode"], response["body"]
+
+
+def test_activates_a_session_from_its_instance(aws, session):
+    status, body = authenticate(aws, session, aws.servers[0][1])
+
+    assert status == 200
+    assert '<auth result="yes"><username>dcv</username>' in body
+
+
+def test_sessions_are_activated_once(aws, session):
+    authenticate(aws, session, aws.servers[0][1])
+
+    status, body = authenticate(aws, session, aws.servers[0][1])
+
+    assert status == 400
+    assert "Session already activated" in body
+
+
+def test_rejects_other_origins(aws, session):
+    status, body = authenticate(aws, session, aws.servers[1][1])
+
+    assert status == 400
+    assert "Unknown origin" in body
+
+
+def test_rejects_a_missing_origin(aws, session):
+    status, body = authenticate(aws, session, None)
+
+    assert status == 400
+    assert "Unknown origin" in body
+
+
+def test_sessions_without_instance_ip_accept_a_missing_origin(aws, session):
+    update_session(session, "REMOVE instance_ip")
+
+    status, _ = authenticate(aws, session, None)
+
+    assert status == 200
+
+
+def test_sessions_without_instance_ip_check_the_origin_with_ec2(aws, session):
+    update_session(session, "REMOVE instance_ip")
+
+    assert authenticate(aws, session, aws.servers[1][1])[0] == 400
+    assert authenticate(aws, session, aws.servers[0][1])[0] == 200
+
+
+def test_rejects_expired_sessions(aws, session):
+    update_session(session, "SET expire_at = :past", {":past": {"N": "1"}})
+
+    status, body = authenticate(aws, session, aws.servers[0][1])
+
+    assert status == 400
+    assert "Expired session" in body
+
+
+def test_rejects_a_wrong_secret(aws, session):
+    update_session(session, "SET secret = :other", {":other": {"S": "other"}})
+
+    status, body = authenticate(aws, session, aws.servers[0][1])
+
+    assert status == 400
+    assert "Invalid secret" in body
+
+
+def test_rejects_malformed_tokens(aws):
+    response = aws.authenticator.handler(
+        events.authenticate("not-a-token", aws.servers[0][1]), None
+    )
+
+    assert response["statusCode"] == 400
+    assert "Invalid token format" in response["body"]
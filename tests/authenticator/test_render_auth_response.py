@@ -0,0 +1,39 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""render_auth_response must keep producing the documents the gateway got
+from the former pydantic models serialized by xmltodict.unparse(). The golden
+files were written by that implementation.
+"""
+
+import os
+
+import pytest
+
+GOLDEN_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden")
+
+# golden file name -> (result, username, message)
+CASES = {
+    "allowed": ("yes", "dcv", None),
+    "rejected": ("no", None, "Session not found"),
+    "empty": ("no", "", ""),
+    "escaped_markup": ("yes", "a&b<c>d", "]]> & <auth>"),
+    "escaped_quotes": ("no", "it's", "both'\""),
+    "escaped_result": ('y"&<', None, None),
+    "whitespace": ("no", "tab\tuser", "line\nbreak\r"),
+    "non_ascii": ("yes", "üñí©ødé", "セッション"),
+}
+
+
+@pytest.mark.parametrize("name", sorted(CASES))
+def test_matches_golden_file(authenticator, name):
+    result, username, message = CASES[name]
+    with open(
+        os.path.join(GOLDEN_DIR, f"{name}.xml"), encoding="utf-8", newline=""
+    ) as f:
+        expected = f.read()
+
+    assert (
+        authenticator.render_auth_response(result, username=username, message=message)
+        == expected
+    )
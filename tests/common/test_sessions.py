@@ -0,0 +1,89 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import time
+
+import pytest
+
+import events
+from dcv_common import sessions
+from fakes import InMemorySessionStore, session_item
+
+
+@pytest.fixture
+def store():
+    return InMemorySessionStore([session_item("a", time.time() + 3600)])
+
+
+def test_cached_store_reads_sessions_once(store):
+    cached = sessions.CachedSessionStore(store, ttl=60, max_size=10)
+
+    first = cached.get("a")
+
+    assert cached.get("a") is first
+    assert store.reads == 1
+    assert "secret" not in first
+
+
+def test_cached_store_does_not_cache_unknown_sessions(store):
+    cached = sessions.CachedSessionStore(store, ttl=60, max_size=10)
+
+    assert cached.get("unknown") is None
+    store.put(session_item("unknown", time.time() + 3600))
+
+    assert cached.get("unknown") is not None
+
+
+def test_cached_store_keeps_sessions_up_to_their_ttl(store, monkeypatch):
+    cached = sessions.CachedSessionStore(store, ttl=60, max_size=10)
+    now = time.time()
+    cached.get("a")
+
+    monkeypatch.setattr(sessions.time, "time", lambda: now + 61)
+    cached.get("a")
+
+    assert store.reads == 2
+
+
+def test_cached_store_never_keeps_sessions_past_their_expiry(store, monkeypatch):
+    now = time.time()
+    store.put(session_item("b", now + 5))
+    cached = sessions.CachedSessionStore(store, ttl=60, max_size=10)
+    cached.get("b")
+
+    monkeypatch.setattr(sessions.time, "time", lambda: now + 6)
+    cached.get("b")
+
+    assert store.reads == 2
+
+
+@pytest.mark.parametrize(
+    "cache_ttl, dax_endpoint",
+    [(0, None), (0, "daxs://cluster"), (30, None), (30, "daxs://cluster")],
+)
+def test_store_selection(monkeypatch, cache_ttl, dax_endpoint):
+    monkeypatch.setattr(sessions, "SESSION_CACHE_TTL", cache_ttl)
+    monkeypatch.setattr(sessions, "DAX_ENDPOINT", dax_endpoint)
+
+    store = sessions.create_session_store()
+
+    if cache_ttl:
+        assert isinstance(store, sessions.CachedSessionStore)
+        assert store.ttl == cache_ttl
+        store = store.store
+    assert isinstance(store, sessions.DynamoDBSessionStore)
+    assert store.dax_endpoint == dax_endpoint
+
+
+def test_resolver_reads_through_its_session_store(aws, monkeypatch):
+    store = InMemorySessionStore(
+        [session_item("a", time.time() + 3600, instance_ip="10.0.0.9")]
+    )
+    monkeypatch.setattr(aws.resolver, "session_store", store)
+
+    response = aws.resolver.handler(events.resolve("a", "HTTP"), None)
+
+    assert response["statusCode"] == 200
+    assert events.body(response)["DcvServerEndpoint"] == "10.0.0.9"
+    assert aws.resolver.handler(events.resolve("b"), None)["statusCode"] == 404
+    assert store.reads == 2
@@ -0,0 +1,98 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import base64
+import time
+
+import pytest
+from botocore.exceptions import ClientError
+
+from dcv_common import clients, tokens
+
+
+@pytest.fixture
+def kms_calls(aws):
+    calls = []
+    clients.kms.meta.events.register(
+        "before-call.kms", lambda event_name, **kwargs: calls.append(event_name)
+    )
+    return calls
+
+
+@pytest.fixture
+def local_mode(monkeypatch):
+    monkeypatch.setattr(tokens, "TOKEN_MODE", "local")
+
+
+def test_kms_tokens_round_trip(aws):
+    token = tokens.create_auth_token("session", "secret")
+
+    assert not token.startswith("dk1.")
+    assert tokens.open_auth_token(token) == {
+        "session_id": "session",
+        "secret": "secret",
+    }
+
+
+def test_local_tokens_round_trip(aws, local_mode):
+    token = tokens.create_auth_token("session", "secret")
+
+    assert token.startswith("dk1.")
+    assert tokens.open_auth_token(token) == {
+        "session_id": "session",
+        "secret": "secret",
+    }
+
+
+def test_local_tokens_reuse_the_data_key(aws, local_mode, kms_calls):
+    issued = [tokens.create_auth_token(f"session-{n}", "secret") for n in range(5)]
+    for token in issued:
+        tokens.open_auth_token(token)
+
+    assert kms_calls == [
+        "before-call.kms.GenerateDataKey",
+        "before-call.kms.Decrypt",
+    ]
+
+
+def test_data_keys_are_replaced_once_too_old(aws, local_mode, kms_calls):
+    first = tokens.get_signing_key()
+    tokens.data_key = (time.monotonic() - 1, *tokens.data_key[1:])
+
+    assert tokens.get_signing_key() != first
+    assert kms_calls.count("before-call.kms.GenerateDataKey") == 2
+
+
+def test_verification_keys_are_bounded(aws, local_mode, monkeypatch):
+    monkeypatch.setattr(tokens, "DATA_KEY_CACHE_SIZE", 2)
+    issued = []
+    for n in range(3):
+        tokens.data_key = None
+        issued.append(tokens.create_auth_token(f"session-{n}", "secret"))
+    for token in issued:
+        tokens.open_auth_token(token)
+
+    wrapped_keys = [token.split(".")[1] for token in issued]
+    assert list(tokens.data_keys) == wrapped_keys[1:]
+
+
+def test_local_tokens_with_a_changed_payload_are_rejected(aws, local_mode):
+    prefix, wrapped_key, payload, signature = tokens.create_auth_token(
+        "session", "secret"
+    ).split(".")
+    forged = base64.urlsafe_b64encode(
+        b'{"session_id": "other", "secret": "secret"}'
+    ).decode()
+
+    with pytest.raises(ValueError):
+        tokens.open_auth_token(".".join([prefix, wrapped_key, forged, signature]))
+
+
+def test_local_tokens_with_a_foreign_data_key_are_rejected(aws, local_mode):
+    prefix, _, payload, signature = tokens.create_auth_token("session", "secret").split(
+        "."
+    )
+    foreign_key = base64.urlsafe_b64encode(b"not a wrapped key").decode()
+
+    with pytest.raises(ClientError):
+        tokens.open_auth_token(".".join([prefix, foreign_key, payload, signature]))
@@ -0,0 +1,74 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import importlib.util
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# the shared layer is mounted on the Lambda path, the load test environment
+# and the CDK constructs are imported from the repository root
+sys.path.insert(0, os.path.join(ROOT, "src", "common", "python"))
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+sys.path.insert(0, ROOT)
+# the handlers need a region
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+os.environ.setdefault("DCV_METRICS", "false")
+os.environ.setdefault("DCV_TABLE_NAME", "DcvAccessManagement")
+os.environ.setdefault("MOTO_EC2_LOAD_DEFAULT_AMIS", "false")
+
+
+def load_handler(name):
+    """Imports src/<name>/index.py, handler modules share the name index."""
+    spec = importlib.util.spec_from_file_location(
+        f"{name}_index", os.path.join(ROOT, "src", name, "index.py")
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+@pytest.fixture(scope="session")
+def authenticator():
+    return load_handler("authenticator")
+
+
+@pytest.fixture
+def aws(monkeypatch):
+    """moto backed EC2, DynamoDB and KMS with the stack's session table.
+
+    Two tagged DCV servers are running; handler modules are loaded fresh so
+    their caches start empty.
+    """
+    from moto import mock_aws
+
+    import load_test
+    from dcv_common import clients, instances, tokens
+
+    with mock_aws():
+        # clients are created on first use, create them inside the mock
+        for name in clients.SERVICES:
+            monkeypatch.delitem(vars(clients), name, raising=False)
+        key_id, servers = load_test.create_environment(2)
+        monkeypatch.setattr(tokens, "KMS_KEY", key_id)
+        monkeypatch.setattr(tokens, "data_key", None)
+        monkeypatch.setattr(tokens, "data_keys", tokens.OrderedDict())
+        monkeypatch.setattr(
+            instances,
+            "instance_cache",
+            instances.TTLCache(instances.INSTANCE_CACHE_SIZE),
+        )
+        yield SimpleNamespace(
+            key_id=key_id,
+            servers=servers,
+            create_session=load_handler("create_session"),
+            resolver=load_handler("resolver"),
+            authenticator=load_handler("authenticator"),
+            sessions=load_handler("sessions"),
+        )
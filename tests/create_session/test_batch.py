@@ -0,0 +1,127 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import itertools
+
+import boto3
+import pytest
+from botocore.exceptions import ClientError
+
+import events
+import load_test
+from dcv_common import clients
+
+
+def run_servers(count, tags=()):
+    ec2 = boto3.client("ec2")
+    instances = ec2.run_instances(
+        ImageId=load_test.IMAGE_ID,
+        MinCount=count,
+        MaxCount=count,
+        TagSpecifications=[
+            {
+                "ResourceType": "instance",
+                "Tags": [
+                    {"Key": "dcv:type", "Value": "server"},
+                    {"Key": "dcv:user", "Value": "dcv"},
+                    *tags,
+                ],
+            }
+        ],
+    )["Instances"]
+    return [instance["InstanceId"] for instance in instances]
+
+
+def stored_session_ids():
+    return {
+        item["session_id"]["S"]
+        for item in boto3.client("dynamodb").scan(TableName="DcvAccessManagement")[
+            "Items"
+        ]
+    }
+
+
+def create_sessions(aws, instance_ids):
+    response = aws.create_session.handler(events.create_sessions(instance_ids), None)
+    assert response["statusCode"] == 200
+    return events.body(response)
+
+
+@pytest.fixture
+def failing_batch_writes(aws, monkeypatch):
+    """Makes every other BatchWriteItem call fail with a throttling error."""
+    batch_write_item = clients.dynamodb.batch_write_item
+    calls = itertools.count()
+
+    def flaky_batch_write_item(**kwargs):
+        if next(calls) % 2:
+            raise ClientError(
+                {"Error": {"Code": "ThrottlingException"}}, "BatchWriteItem"
+            )
+        return batch_write_item(**kwargs)
+
+    monkeypatch.setattr(clients.dynamodb, "batch_write_item", flaky_batch_write_item)
+
+
+def test_creates_a_session_per_instance(aws):
+    instance_ids = [instance_id for instance_id, _ in aws.servers]
+
+    body = create_sessions(aws, instance_ids + instance_ids[:1])
+
+    assert body["errors"] == []
+    assert sorted(s["instanceId"] for s in body["sessions"]) == sorted(instance_ids)
+    assert {s["sessionId"] for s in body["sessions"]} == stored_session_ids()
+    for session, (_, instance_ip) in zip(body["sessions"], aws.servers):
+        response = aws.authenticator.handler(
+            events.authenticate(session["authToken"], instance_ip), None
+        )
+        assert response["statusCode"] == 200
+
+
+def test_reports_instances_that_cannot_have_sessions(aws):
+    (untagged,) = boto3.client("ec2").run_instances(
+        ImageId=load_test.IMAGE_ID,
+        MinCount=1,
+        MaxCount=1,
+    )["Instances"]
+    (bad_port,) = run_servers(1, [{"Key": "dcv:tcp-port", "Value": "http"}])
+    valid = aws.servers[0][0]
+
+    body = create_sessions(
+        aws, [valid, untagged["InstanceId"], bad_port, "i-0000000000000000f"]
+    )
+
+    assert [s["instanceId"] for s in body["sessions"]] == [valid]
+    assert body["errors"] == [
+        {
+            "instanceId": untagged["InstanceId"],
+            "error": "Instance has no required tags",
+        },
+        {"instanceId": bad_port, "error": "Invalid dcv:tcp-port tag"},
+        {"instanceId": "i-0000000000000000f", "error": "Invalid instanceId"},
+    ]
+
+
+def test_reports_sessions_of_failed_chunks(aws, failing_batch_writes):
+    instance_ids = run_servers(60)
+
+    body = create_sessions(aws, instance_ids)
+
+    stored = stored_session_ids()
+    # chunks of 25: the first and third are written, the second fails
+    assert len(body["sessions"]) == 35
+    assert {s["sessionId"] for s in body["sessions"]} == stored
+    assert body["errors"] == [
+        {"instanceId": instance_id, "error": "Session could not be stored"}
+        for instance_id in instance_ids
+        if instance_id not in {s["instanceId"] for s in body["sessions"]}
+    ]
+    assert len(body["errors"]) == 25
+
+
+def test_rejects_malformed_bodies(aws):
+    for body in ["nope", '{"instanceIds": "i-1"}', '{"instanceIds": []}']:
+        response = aws.create_session.handler(
+            {"resource": "/sessions", "httpMethod": "POST", "body": body}, None
+        )
+        assert response["statusCode"] == 400
@@ -0,0 +1,91 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import boto3
+import pytest
+
+import events
+from dcv_common import clients, tokens
+
+
+@pytest.fixture
+def kms_calls(aws):
+    calls = []
+    clients.kms.meta.events.register(
+        "before-call.kms", lambda event_name, **kwargs: calls.append(event_name)
+    )
+    return calls
+
+
+def create(aws, idempotency_key, server=0):
+    instance_id, _ = aws.servers[server]
+    response = aws.create_session.handler(
+        events.create_session(instance_id, idempotency_key), None
+    )
+    assert response["statusCode"] == 200
+    return events.body(response)
+
+
+def test_repeats_return_the_session_and_token_without_kms(aws, kms_calls):
+    first = create(aws, "key")
+    kms_calls.clear()
+
+    repeat = create(aws, "key")
+
+    assert repeat == first
+    assert kms_calls == []
+
+
+def test_repeats_mint_the_token_while_it_is_not_stored(aws):
+    first = create(aws, "key")
+    boto3.client("dynamodb").update_item(
+        TableName="DcvAccessManagement",
+        Key={"session_id": {"S": first["sessionId"]}},
+        UpdateExpression="REMOVE auth_token",
+    )
+
+    repeat = create(aws, "key")
+
+    assert repeat["sessionId"] == first["sessionId"]
+    response = aws.authenticator.handler(
+        events.authenticate(repeat["authToken"], aws.servers[0][1]), None
+    )
+    assert response["statusCode"] == 200
+
+
+def test_local_tokens_are_not_stored(aws, monkeypatch):
+    monkeypatch.setattr(aws.create_session, "TOKEN_MODE", "local")
+    monkeypatch.setattr(tokens, "TOKEN_MODE", "local")
+
+    first = create(aws, "key")
+    repeat = create(aws, "key")
+
+    assert repeat["sessionId"] == first["sessionId"]
+    item = boto3.client("dynamodb").get_item(
+        TableName="DcvAccessManagement",
+        Key={"session_id": {"S": first["sessionId"]}},
+    )["Item"]
+    assert "auth_token" not in item
+
+
+def test_keys_instances_and_plain_requests_get_new_sessions(aws):
+    first = create(aws, "key")
+
+    assert create(aws, "other")["sessionId"] != first["sessionId"]
+    assert create(aws, "key", server=1)["sessionId"] != first["sessionId"]
+    assert create(aws, None)["sessionId"] != first["sessionId"]
+
+
+def test_activated_sessions_are_not_handed_out_again(aws):
+    first = create(aws, "key")
+    aws.authenticator.handler(
+        events.authenticate(first["authToken"], aws.servers[0][1]), None
+    )
+
+    repeat = create(aws, "key")
+
+    assert repeat["sessionId"] != first["sessionId"]
+    response = aws.authenticator.handler(
+        events.authenticate(repeat["authToken"], aws.servers[0][1]), None
+    )
+    assert response["statusCode"] == 200
@@ -0,0 +1,70 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""REST API events of the handlers' routes, as API Gateway sends them."""
+
+import json
+from urllib.parse import urlencode
+
+CALLER_ARN = "arn:aws:iam::123456789012:user/portal"
+
+
+def create_session(instance_id, idempotency_key=None):
+    return {
+        "resource": "/session",
+        "httpMethod": "POST",
+        "queryStringParameters": {"instanceId": instance_id},
+        "headers": {"Idempotency-Key": idempotency_key} if idempotency_key else {},
+        "requestContext": {"identity": {"userArn": CALLER_ARN}},
+        "body": None,
+    }
+
+
+def create_sessions(instance_ids):
+    return {
+        "resource": "/sessions",
+        "httpMethod": "POST",
+        "requestContext": {"identity": {"userArn": CALLER_ARN}},
+        "body": json.dumps({"instanceIds": instance_ids}),
+    }
+
+
+def resolve(session_id, transport="QUIC", client_ip="198.51.100.7"):
+    params = {"sessionId": session_id, "transport": transport}
+    if client_ip is not None:
+        params["clientIpAddress"] = client_ip
+    return {
+        "resource": "/resolveSession",
+        "httpMethod": "POST",
+        "requestContext": {"identity": {"sourceIp": "10.0.0.2"}},
+        "body": urlencode(params),
+    }
+
+
+def authenticate(auth_token, source_ip):
+    return {
+        "resource": "/authenticate",
+        "httpMethod": "POST",
+        "requestContext": {"identity": {"sourceIp": source_ip}},
+        "body": urlencode({"authenticationToken": auth_token}),
+    }
+
+
+def list_sessions(**params):
+    return {
+        "resource": "/sessions",
+        "httpMethod": "GET",
+        "queryStringParameters": params,
+    }
+
+
+def delete_session(session_id):
+    return {
+        "resource": "/session/{id}",
+        "httpMethod": "DELETE",
+        "pathParameters": {"id": session_id},
+    }
+
+
+def body(response):
+    return json.loads(response["body"])
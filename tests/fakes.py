@@ -0,0 +1,52 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""Local stand-ins for the handlers' pluggable dependencies."""
+
+from dcv_common.sessions import RESOLVE_ATTRIBUTES
+
+
+class InMemorySessionStore:
+    """Session store holding items in a dict, for tests without DynamoDB.
+
+    Reads return the RESOLVE_ATTRIBUTES like DynamoDBSessionStore and are
+    counted in ``reads``.
+    """
+
+    def __init__(self, items=()):
+        self.items = {item["session_id"]["S"]: item for item in items}
+        self.reads = 0
+
+    def put(self, item):
+        self.items[item["session_id"]["S"]] = item
+
+    def delete(self, session_id):
+        self.items.pop(session_id, None)
+
+    def get(self, session_id):
+        self.reads += 1
+        item = self.items.get(session_id)
+        if item is None:
+            return None
+        return {
+            name: value for name, value in item.items() if name in RESOLVE_ATTRIBUTES
+        }
+
+
+def session_item(session_id, expire_at, instance_ip="10.0.0.5", **attributes):
+    """A session item as create_session stores it."""
+    return {
+        "session_id": {"S": session_id},
+        "secret": {"S": "secret"},
+        "instance_id": {"S": "i-0123456789abcdef0"},
+        "username": {"S": "dcv"},
+        "created_at": {"N": "0"},
+        "expire_at": {"N": str(int(expire_at))},
+        "ttl": {"N": str(int(expire_at))},
+        "activated_at": {"N": "0"},
+        "instance_ip": {"S": instance_ip},
+        "tcp_port": {"N": "8443"},
+        "udp_port": {"N": "8443"},
+        "transports": {"SS": ["HTTP", "QUIC"]},
+        **attributes,
+    }
@@ -0,0 +1,37 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+"""The gateway role may only read the attributes the resolver sidecar
+projects; any attribute outside its dynamodb:Attributes condition would make
+every sidecar GetItem fail with AccessDenied.
+"""
+
+from dcv_common import sessions
+from dcv_with_gateway.construct.session_table import SESSION_RESOLVE_ATTRIBUTES
+
+
+class RecordingClient:
+    def __init__(self):
+        self.calls = []
+
+    def get_item(self, **kwargs):
+        self.calls.append(kwargs)
+        return {}
+
+
+def test_gateway_policy_covers_the_resolve_attributes():
+    assert SESSION_RESOLVE_ATTRIBUTES == sessions.RESOLVE_ATTRIBUTES
+
+
+def test_session_store_reads_only_the_resolve_attributes(monkeypatch):
+    client = RecordingClient()
+    monkeypatch.setitem(vars(sessions.clients), "dynamodb", client)
+
+    sessions.DynamoDBSessionStore().get("session")
+
+    (call,) = client.calls
+    projected = [
+        call["ExpressionAttributeNames"][name.strip()]
+        for name in call["ProjectionExpression"].split(",")
+    ]
+    assert sorted(projected) == sorted(SESSION_RESOLVE_ATTRIBUTES)
@@ -0,0 +1,41 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import pytest
+
+import events
+
+
+@pytest.fixture
+def session_id(aws, monkeypatch):
+    monkeypatch.setattr(aws.resolver, "CLIENT_AFFINITY", True)
+    instance_id, _ = aws.servers[0]
+    return events.body(
+        aws.create_session.handler(events.create_session(instance_id), None)
+    )["sessionId"]
+
+
+def resolve(aws, session_id, client_ip, transport="QUIC"):
+    return aws.resolver.handler(events.resolve(session_id, transport, client_ip), None)[
+        "statusCode"
+    ]
+
+
+def test_binds_the_session_to_the_first_client(aws, session_id):
+    assert resolve(aws, session_id, "198.51.100.7") == 200
+    assert resolve(aws, session_id, "198.51.100.7", "HTTP") == 200
+    assert resolve(aws, session_id, "203.0.113.9") == 403
+
+
+def test_rejects_clients_without_ip(aws, session_id):
+    assert resolve(aws, session_id, None) == 404
+    # an unidentified client does not bind the session either
+    assert resolve(aws, session_id, "203.0.113.9") == 200
+
+
+def test_without_affinity_any_client_resolves(aws, session_id, monkeypatch):
+    monkeypatch.setattr(aws.resolver, "CLIENT_AFFINITY", False)
+
+    assert resolve(aws, session_id, "198.51.100.7") == 200
+    assert resolve(aws, session_id, "203.0.113.9") == 200
+    assert resolve(aws, session_id, None) == 200
@@ -0,0 +1,82 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import events
+
+
+def start_session(aws, server):
+    """Creates a session on the server and activates it, returns its id."""
+    instance_id, instance_ip = server
+    session = events.body(
+        aws.create_session.handler(events.create_session(instance_id), None)
+    )
+    response = aws.authenticator.handler(
+        events.authenticate(session["authToken"], instance_ip), None
+    )
+    assert response["statusCode"] == 200
+    return session
+
+
+def test_listed_sessions_can_be_revoked(aws):
+    instance_id, instance_ip = aws.servers[0]
+    session = start_session(aws, aws.servers[0])
+
+    listed = events.body(
+        aws.sessions.handler(events.list_sessions(instanceId=instance_id), None)
+    )
+    assert [s["sessionId"] for s in listed["sessions"]] == [session["sessionId"]]
+
+    response = aws.sessions.handler(events.delete_session(session["sessionId"]), None)
+    assert response["statusCode"] == 200
+    assert events.body(response) == {
+        "sessionId": session["sessionId"],
+        "instanceId": instance_id,
+    }
+
+    listed = events.body(
+        aws.sessions.handler(events.list_sessions(instanceId=instance_id), None)
+    )
+    assert listed["sessions"] == []
+    response = aws.resolver.handler(events.resolve(session["sessionId"]), None)
+    assert response["statusCode"] == 404
+    response = aws.authenticator.handler(
+        events.authenticate(session["authToken"], instance_ip), None
+    )
+    assert response["statusCode"] == 404
+
+
+def test_pending_sessions_can_be_revoked(aws):
+    instance_id, instance_ip = aws.servers[0]
+    session = events.body(
+        aws.create_session.handler(events.create_session(instance_id), None)
+    )
+
+    response = aws.sessions.handler(events.delete_session(session["sessionId"]), None)
+    assert response["statusCode"] == 200
+
+    response = aws.authenticator.handler(
+        events.authenticate(session["authToken"], instance_ip), None
+    )
+    assert response["statusCode"] == 404
+
+
+def test_unknown_sessions_are_not_found(aws):
+    response = aws.sessions.handler(events.delete_session("unknown"), None)
+    assert response["statusCode"] == 404
+
+
+def test_listing_pages_through_sessions_of_a_user(aws):
+    started = {start_session(aws, server)["sessionId"] for server in aws.servers * 2}
+
+    listed, next_token = [], None
+    while True:
+        params = {"user": "dcv", "limit": "3"}
+        if next_token:
+            params["nextToken"] = next_token
+        page = events.body(aws.sessions.handler(events.list_sessions(**params), None))
+        listed += [session["sessionId"] for session in page["sessions"]]
+        next_token = page.get("nextToken")
+        if not next_token:
+            break
+
+    assert sorted(listed) == sorted(started)
@@ -0,0 +1,83 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: MIT-0
+
+import importlib.util
+import os
+
+import events
+from conftest import ROOT
+
+
+def load_script(name):
+    spec = importlib.util.spec_from_file_location(
+        name, os.path.join(ROOT, "scripts", f"{name}.py")
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def start_legacy_session(aws, server):
+    """Creates and activates a session, then drops the attributes older
+    authenticators did not write."""
+    from dcv_common import clients
+
+    instance_id, instance_ip = server
+    session = events.body(
+        aws.create_session.handler(events.create_session(instance_id), None)
+    )
+    aws.authenticator.handler(
+        events.authenticate(session["authToken"], instance_ip), None
+    )
+    clients.dynamodb.update_item(
+        TableName=os.environ["DCV_TABLE_NAME"],
+        Key={"session_id": {"S": session["sessionId"]}},
+        UpdateExpression="REMOVE active_instance_id, active_username, #ttl",
+        ExpressionAttributeNames={"#ttl": "ttl"},
+    )
+    return session
+
+
+def list_ids(aws, **params):
+    listed = events.body(aws.sessions.handler(events.list_sessions(**params), None))
+    return [session["sessionId"] for session in listed["sessions"]]
+
+
+def test_backfill_adds_legacy_sessions_to_the_indexes(aws):
+    from dcv_common import clients
+
+    backfill = load_script("backfill_active_sessions").backfill
+    instance_id, _ = aws.servers[0]
+    session = start_legacy_session(aws, aws.servers[0])
+    pending = events.body(
+        aws.create_session.handler(events.create_session(instance_id), None)
+    )
+    assert list_ids(aws, instanceId=instance_id) == []
+
+    table = os.environ["DCV_TABLE_NAME"]
+    assert backfill(clients.dynamodb, table, 86400, dry_run=True) == (1, 0)
+    assert backfill(clients.dynamodb, table, 86400) == (1, 1)
+    assert backfill(clients.dynamodb, table, 86400) == (0, 0)
+
+    assert list_ids(aws, instanceId=instance_id) == [session["sessionId"]]
+    assert list_ids(aws, user="dcv") == [session["sessionId"]]
+    item = clients.dynamodb.get_item(
+        TableName=table, Key={"session_id": {"S": session["sessionId"]}}
+    )["Item"]
+    assert int(item["ttl"]["N"]) == int(item["activated_at"]["N"]) + 86400
+    pending_item = clients.dynamodb.get_item(
+        TableName=table, Key={"session_id": {"S": pending["sessionId"]}}
+    )["Item"]
+    assert "active_instance_id" not in pending_item
+
+
+def test_listing_by_user_is_refused_without_the_user_index(aws, monkeypatch):
+    monkeypatch.setattr(aws.sessions, "USER_INDEX", False)
+
+    response = aws.sessions.handler(events.list_sessions(user="dcv"), None)
+    assert response["statusCode"] == 400
+
+    response = aws.sessions.handler(
+        events.list_sessions(instanceId=aws.servers[0][0]), None
+    )
+    assert response["statusCode"] == 200